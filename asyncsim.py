@@ -0,0 +1,212 @@
+import os
+import sys
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import contextlib
+
+from config import *
+
+"""
+Asynchronous runtime: every robot is an asyncio task, messages travel through per-robot queues with
+a latency and jitter, and time is a virtual clock shared by all tasks, so thousands of robots run
+cooperatively in one event loop.
+
+The clock only advances once every task is waiting on it, so a run is deterministic for a given seed
+and independent of the host's speed. Timestep t is split into the PHASES of Simulation.step(): the
+robots all sense at t, then all plan at t + 1/6, and so on. The grid task ends the timestep
+(Simulation.end_step: drop checks, metrics, trajectory, viewer).
+
+A message sent at time s reaches the recipient's queue at s + latency + uniform(-jitter, jitter)
+(never earlier than s), and is read in the recipient's first reading phase after that. The delay
+replaces the countdown of MESSAGE_DELAY, which the lockstep Simulation uses.
+
+    sim = Simulation()
+    runtime = AsyncRuntime(sim, latency=1.5, jitter=1.0, seed=0)
+    runtime.run(max_timesteps=2000, quiet=True)
+
+    python asyncsim.py 1.5 1.0     # latency, jitter (in timesteps)
+"""
+
+PHASES = ["sense", "plan", "match", "read", "execute", "end"]
+
+def phase_time(timestep, phase):
+    return timestep + PHASES.index(phase) / len(PHASES)
+
+class VirtualClock:
+    """Discrete-event clock for asyncio tasks: time jumps to the next event once every task waits."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.events = []  # heap of (time, seq, future or None, callback, args)
+        self.seq = itertools.count()
+        self.running = 0  # tasks that are not waiting on the clock
+        self.quiet = asyncio.Event()
+
+    def call_at(self, when, callback, *args):
+        """Run callback(*args) once the clock reaches when."""
+        heapq.heappush(self.events, (max(when, self.now), next(self.seq), None, callback, args))
+
+    async def sleep_until(self, when):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.events, (max(when, self.now), next(self.seq), future, None, ()))
+        self.stop()
+        await future
+
+    def start(self):
+        self.running += 1
+
+    def stop(self):
+        """A task is waiting on the clock (or finished)."""
+        self.running -= 1
+        if self.running == 0:
+            self.quiet.set()
+
+    def advance(self):
+        """Move to the next event time and fire everything due then, in the order it was scheduled."""
+        self.now = self.events[0][0]
+        while self.events and self.events[0][0] == self.now:
+            _, _, future, callback, args = heapq.heappop(self.events)
+            if future is None:
+                callback(*args)
+            elif not future.cancelled():
+                self.running += 1
+                future.set_result(None)
+
+    async def drive(self, until=None):
+        """Advance the clock until no events are left or the next one is at or after until."""
+        while True:
+            while self.running:
+                self.quiet.clear()
+                await self.quiet.wait()
+            if not self.events or (until is not None and self.events[0][0] >= until):
+                return
+            self.advance()
+
+class Network:
+    """Delivers robot messages through per-robot asyncio queues after a latency with jitter."""
+
+    def __init__(self, clock, latency: float = 1.0, jitter: float = 0.0, seed=None):
+        self.clock = clock
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed) # own stream, so the delays do not shift the robots' choices
+        self.inboxes = {} # {robot: asyncio.Queue}
+        self.sent = 0
+        self.delivered = 0
+
+    def inbox(self, robot):
+        if robot not in self.inboxes:
+            self.inboxes[robot] = asyncio.Queue()
+        return self.inboxes[robot]
+
+    def delay(self):
+        return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+    def max_delay(self):
+        return self.latency + self.jitter
+
+    def send(self, message, acceptor, delay=None):
+        """Called by Robot.send_message in place of the countdown delivery (delay: a fixed delay instead of a random one)."""
+        message = message.copy()
+        message.countdown = 0 # readable as soon as it arrives
+        self.sent += 1
+        self.clock.call_at(self.clock.now + (self.delay() if delay is None else delay), self.deliver, message, acceptor)
+
+    def deliver(self, message, acceptor):
+        self.inbox(acceptor).put_nowait(message)
+        self.delivered += 1
+
+    def receive(self, robot):
+        """Move the messages that reached robot's queue into its KB."""
+        queue = self.inbox(robot)
+        while not queue.empty():
+            robot.receive_message(queue.get_nowait())
+
+class AsyncRuntime:
+    """Runs a Simulation with one asyncio task per robot and one for the grid."""
+
+    def __init__(self, sim, latency: float = 1.0, jitter: float = 0.0, seed=None):
+        if sim.grid.scheduler:
+            raise ValueError("The asynchronous runtime does not use the Scheduler; create the Simulation without use_scheduler")
+        self.sim = sim
+        self.latency = latency
+        self.jitter = jitter
+        self.seed = seed
+        self.clock = None
+        self.network = None
+        self.done = False
+
+    async def robot_task(self, robot):
+        clock, network, timestep = self.clock, self.network, self.sim.timestep
+        try:
+            while not self.done:
+                await clock.sleep_until(phase_time(timestep, "sense"))
+                if self.done:
+                    return
+                robot.timestep = timestep
+                robot.sense()
+                await clock.sleep_until(phase_time(timestep, "plan"))
+                robot.plan(timestep)
+                await clock.sleep_until(phase_time(timestep, "read"))
+                network.receive(robot)
+                robot.read_message()
+                await clock.sleep_until(phase_time(timestep, "execute"))
+                robot.execute(timestep)
+                timestep += 1
+        finally:
+            clock.stop()
+
+    async def grid_task(self, max_timesteps):
+        sim, clock = self.sim, self.clock
+        try:
+            while not sim.finished() and (max_timesteps is None or sim.timestep < max_timesteps):
+                timestep = sim.timestep
+                await clock.sleep_until(phase_time(timestep, "sense"))
+                start = time.perf_counter()
+                print("========= START OF TIMESTEP " + str(timestep) + " =========")
+                await clock.sleep_until(phase_time(timestep, "match"))
+                if sim.grid.matchmaker:
+                    sim.grid.matchmaker.match()
+                await clock.sleep_until(phase_time(timestep, "end"))
+                sim.end_step(start)
+        finally:
+            self.done = True
+            clock.stop()
+
+    async def main(self, max_timesteps):
+        self.clock = VirtualClock()
+        self.network = Network(self.clock, self.latency, self.jitter, self.seed)
+        self.clock.now = phase_time(self.sim.timestep, "sense")
+        self.sim.grid.network = self.network
+        self.clock.start()
+        tasks = [asyncio.create_task(self.grid_task(max_timesteps))] # first, so it opens every timestep
+        for robot in self.sim.grid.robots:
+            self.clock.start()
+            tasks.append(asyncio.create_task(self.robot_task(robot)))
+        try:
+            await self.clock.drive()
+            await asyncio.gather(*tasks) # all finished by now; re-raises a robot's exception
+        finally:
+            self.sim.grid.network = None
+
+    def run(self, max_timesteps: int = None, quiet: bool = False):
+        """Run until the game ends (or max_timesteps is reached); returns the timestep."""
+        self.sim.log_messages = not quiet
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull if quiet else sys.stdout):
+            asyncio.run(self.main(max_timesteps))
+        return self.sim.timestep
+
+if __name__ == "__main__":
+    from simulation import Simulation
+
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    jitter = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    start = time.perf_counter()
+    sim = Simulation()
+    runtime = AsyncRuntime(sim, latency=latency, jitter=jitter, seed=0)
+    timestep = runtime.run(max_timesteps=5000, quiet=True)
+    print(ANSI.GREEN.value + f"{len(sim.grid.robots)} robots, latency {latency} jitter {jitter}: {timestep} timesteps, scores {sim.grid.scores[Team.RED]}/{sim.grid.scores[Team.BLUE]}, "
+          f"{runtime.network.delivered}/{runtime.network.sent} messages delivered, {time.perf_counter() - start:.1f}s" + ANSI.RESET.value)
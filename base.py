@@ -1,5 +1,6 @@
 import random
 from config import *
+from direction import *
 
 class Tile:
     def __init__(self, position: list, deposit: bool = False, gold: int = 0):
@@ -9,14 +10,25 @@ class Tile:
         self.robots = []              # List of robot objects at that tile
 
         self.gold_acquirable = False      # two robots need to pickup gold for it to be acquired
+        self.watchers = set()             # sleeping robots to wake up when this tile changes
+        self.version = 0                  # bumped on every change, so robots can tell if what they sensed is still current
+
+    def changed(self):
+        """Called whenever the gold or robots on this tile change."""
+        self.version += 1
+        if self.watchers:
+            for robot in list(self.watchers):
+                robot.wake()
     
     def set_deposit(self):
         """Mark this tile as a deposit location."""
         self.deposit = True
+        self.changed()
     
     def add_gold(self):
         """Add one piece of gold to this tile."""
         self.gold += 1
+        self.changed()
 
     def remove_gold(self):
         """Remove one piece of gold (if available)."""
@@ -25,6 +37,7 @@ class Tile:
                 self.gold -= 1
                 self.gold_acquirable = False
             self.gold_acquirable = True
+            self.changed()
         else:
             #raise ValueError("No gold on this tile.")
             print("No gold on this tile.")
@@ -33,6 +46,7 @@ class Tile:
         """Add a robot onto the tile"""
         if robot not in self.robots:
             self.robots.append(robot)
+            self.changed()
         else:
             raise ValueError("Robot already on tile!")
     
@@ -40,32 +54,75 @@ class Tile:
         """Remove a robot off the tile"""
         if robot in self.robots:
             self.robots.remove(robot)
+            self.changed()
         else:
             raise ValueError("Robot not on tile!")
 
+class SparseTiles(dict):
+    """{(x,y): Tile} that only holds the cells something has touched.
+
+    A cell's Tile is created the first time it is looked up (placing gold, a robot or a deposit on
+    it, a robot sensing it), so memory and startup scale with what is on the map and where the robots
+    have been, not with its area. Iterating gives the created tiles only; every other cell is empty.
+    """
+
+    def __missing__(self, pos):
+        x, y = pos
+        if 0 <= x < GRID_SIZE and 0 <= y < GRID_SIZE:
+            tile = self[pos] = Tile(position=[x,y])
+            return tile
+        raise KeyError(pos)
+
+    def get(self, pos, default=None):
+        try:
+            return self[pos]
+        except KeyError:
+            return default
+
 class Grid:
-    def __init__(self):
-        self.tiles = {} # {(x,y): Tile}
-        for x in range(GRID_SIZE):
-            for y in range(GRID_SIZE):
-                self.tiles[(x, y)] = Tile(position=[x,y])
+    def __init__(self, scenario=None, sparse: bool = False):
+        self.sparse = sparse
+        if sparse: # tiles are created on first use (see SparseTiles)
+            self.tiles = SparseTiles()
+        else:
+            self.tiles = {} # {(x,y): Tile}
+            for x in range(GRID_SIZE):
+                for y in range(GRID_SIZE):
+                    self.tiles[(x, y)] = Tile(position=[x,y])
+
+        # Running gold bookkeeping, so the end of the game never needs a scan of the tiles
+        self.gold_on_map = 0    # gold lying on tiles
+        self.carriers = set()   # robots currently carrying gold (both halves of every carrying pair)
+        self.robot_order = {}   # {robot: index in self.robots}; keeps drop detection in robot order
+        self.gold_map = None    # optional array of the gold on each tile, indexed [x,y]; kept up to date once set
         
-        # Place gold randomly on the grid
-        for _ in range(GOLDS):
-            while True:
-                x,y = random.randint(0, GRID_SIZE - 1), random.randint(0, GRID_SIZE - 1)
-                if (x,y) not in [(0, 0), (GRID_SIZE - 1, GRID_SIZE - 1)]:
-                    break
-            self.tiles[(x,y)].add_gold()
+        if scenario: # Place gold as generated by a Scenario (see scenario.py)
+            if scenario.size != GRID_SIZE:
+                raise ValueError(f"Scenario is {scenario.size}x{scenario.size}, grid is {GRID_SIZE}x{GRID_SIZE}")
+            self.load_gold(scenario.gold)
+        else: # Place gold randomly on the grid
+            for _ in range(GOLDS):
+                while True:
+                    x,y = random.randint(0, GRID_SIZE - 1), random.randint(0, GRID_SIZE - 1)
+                    if (x,y) not in [(0, 0), (GRID_SIZE - 1, GRID_SIZE - 1)]:
+                        break
+                self.add_gold((x,y))
         
         for pos in [(0,0), (GRID_SIZE-1, GRID_SIZE-1)]:
             self.tiles[pos].set_deposit()
 
         self.robots = [] # Robots currently on the grid
-        self.scores = {Team.RED: 0, Team.BLUE: 0}
+        self.store = None # optional RobotStore holding robot state as arrays
+        self.scheduler = None # optional Scheduler that lets idle robots sleep
+        self.spans = None # optional SpanRecorder of the coordination handshakes
+        self.matchmaker = None # optional Matchmaker assigning helpers to help requests
+        self.heatmaps = None # optional Heatmaps counting events per tile
+        self.network = None # optional Network delivering messages in the asynchronous runtime (asyncsim.py)
+        self.scores = {Team.RED: 0, Team.BLUE: 0} # also the gold deposited per team
 
     def add_robot(self, robot, pos):
         """Add a robot to the grid."""
+        self.robot_order[robot] = len(self.robots)
         self.robots.append(robot)
         self.tiles[pos].add_robot(robot)
     
@@ -73,28 +130,77 @@ class Grid:
         """Add one point to the team's score."""
         self.scores[team] += 0.5 # 1 for each robot's deposit
 
+    def add_gold(self, pos):
+        """Add one piece of gold to the tile at pos."""
+        self.tiles[pos].add_gold()
+        self.gold_on_map += 1
+        if self.gold_map is not None:
+            self.gold_map[pos] += 1
+
+    def load_gold(self, gold):
+        """Place an [x,y] array of gold counts in one pass, and keep it (as int32) as gold_map."""
+        xs, ys = gold.nonzero()
+        counts = gold[xs, ys].tolist()
+        for x, y, count in zip(xs.tolist(), ys.tolist(), counts):
+            tile = self.tiles[(x, y)]
+            tile.gold += count
+            tile.changed()
+        self.gold_on_map += sum(counts)
+        if self.gold_map is None:
+            self.gold_map = gold.astype("int32")
+        else:
+            self.gold_map += gold
+
+    def remove_gold(self, pos):
+        """Remove one piece of gold from the tile at pos (needs both robots of a pair)."""
+        tile = self.tiles[pos]
+        gold = tile.gold
+        tile.remove_gold()
+        self.gold_on_map -= gold - tile.gold
+        if self.gold_map is not None:
+            self.gold_map[pos] -= gold - tile.gold
+
+    def attach_gold_map(self, gold_map):
+        """Start keeping gold_map (an [x,y] array, e.g. a view into a stacked array) in line with the tiles."""
+        gold_map[:] = 0
+        for pos, tile in self.tiles.items():
+            gold_map[pos] = tile.gold
+        self.gold_map = gold_map
+
+    def update_carrying(self, robot):
+        """Keep the index of carrying robots in line with robot.carrying."""
+        if robot.carrying:
+            self.carriers.add(robot)
+        else:
+            self.carriers.discard(robot)
+
+    def carrying_pairs(self):
+        """List of (robot, partner) pairs where at least one robot is carrying gold."""
+        pairs = []
+        seen = set()
+        for robot in sorted(self.carriers, key=lambda r: r.id):
+            if robot not in seen:
+                seen.add(robot)
+                seen.add(robot.partner)
+                pairs.append((robot, robot.partner))
+        return pairs
+
+    def gold_in_transit(self):
+        """Gold currently carried, counted like the scores (half per carrying robot)."""
+        return len(self.carriers) * 0.5
+
+    def all_gold_collected(self):
+        """True once no gold is left on the map or being carried."""
+        return self.gold_on_map <= 0 and not self.carriers
+
     def check_gold(self):
-        for robot in self.robots:
+        for robot in sorted(self.carriers, key=self.robot_order.get):
             if robot.carrying and robot.partner and (robot.pos != robot.partner.pos):
                 print(f"DROPPED GOLD: robot {robot.id} and robot {robot.partner.id} dropped gold at {robot.pos}")
-                self.tiles[tuple(robot.pos)].add_gold()
+                if self.heatmaps:
+                    self.heatmaps.drop(robot.pos)
+                self.add_gold(robot.cell)
                 robot.partner.carrying = False
                 robot.partner.partner = None
                 robot.carrying = False
                 robot.partner = None
-
-# Turn clockwise
-def turn_cw(vector):
-    x,y = vector
-    return (-y,x)
-
-# In Pygame (0,0) is top-left; y increases downwards; x increases rightwards)
-DIR_VECT = {Dir.NORTH:(0,-1), Dir.EAST:(1,0), Dir.SOUTH:(0,1), Dir.WEST:(-1,0)}
-
-# Relative sensing vectors
-NORTH_SENSE = [(-1,-1),(0,-1),(1,-1),(-2,-2),(-1,-2),(0,-2),(1,-2),(2,-2)]
-EAST_SENSE = [turn_cw(v) for v in NORTH_SENSE]
-SOUTH_SENSE = [turn_cw(v) for v in EAST_SENSE]
-WEST_SENSE = [turn_cw(v) for v in SOUTH_SENSE]
-
-SENSE_VECT = {Dir.NORTH: NORTH_SENSE, Dir.EAST: EAST_SENSE, Dir.SOUTH: SOUTH_SENSE, Dir.WEST: WEST_SENSE}
\ No newline at end of file
@@ -1,3 +1,5 @@
+import os
+import json
 from enum import Enum
 
 class Team(Enum):
@@ -14,12 +16,26 @@ class Dir(Enum):
 GRID_SIZE = 20
 CELL_SIZE = 40
 SCORES_HEIGHT = 30
-X_WINDOW_SIZE = GRID_SIZE * CELL_SIZE
-Y_WINDOW_SIZE = GRID_SIZE * CELL_SIZE + SCORES_HEIGHT
 FPS = 2
 ROBOTS_PER_TEAM = 4
 GOLDS = 20
 
+# Protocol timing
+PICKUP_DELAY = 10   # how many timesteps ahead a pickup is scheduled (plan_pickup)
+PLAN_DELAY = 10     # how many timesteps ahead a synced move plan starts (propose_sync_plan)
+MESSAGE_DELAY = (1, 3)  # range of the random countdown before a message is delivered
+HELP_RADIUS = 5     # robots closer than this respond to help requests
+ADAPTIVE_SYNC = True    # schedule handshakes from the observed partner round trip instead of the fixed delays
+SYNC_MARGIN = 2     # timesteps added to the round trip estimate
+SYNC_DEVIATIONS = 4 # round trip deviations added to the estimate, like TCP's retransmission timeout
+
+# Overrides for headless runs, e.g. parameter sweeps: CPR_CONFIG='{"GRID_SIZE": 30, "GOLDS": 50}'
+for name, value in json.loads(os.environ.get("CPR_CONFIG", "{}")).items():
+    globals()[name] = value
+
+X_WINDOW_SIZE = GRID_SIZE * CELL_SIZE
+Y_WINDOW_SIZE = GRID_SIZE * CELL_SIZE + SCORES_HEIGHT
+
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -0,0 +1,50 @@
+from config import *
+
+# Direction math, precomputed once at import so robots never rebuild direction lists while deciding
+
+# Turn clockwise
+def turn_cw(vector):
+    x,y = vector
+    return (-y,x)
+
+DIR_ORDER = [Dir.NORTH, Dir.EAST, Dir.SOUTH, Dir.WEST] # clockwise; DIR_ORDER[d.value] == d
+
+# Successor after turning clockwise / counterclockwise
+CW = {d: DIR_ORDER[(i + 1) % 4] for i, d in enumerate(DIR_ORDER)}
+CCW = {d: DIR_ORDER[(i - 1) % 4] for i, d in enumerate(DIR_ORDER)}
+
+# Action that turns a robot facing current toward target: {(current, target): action}
+# (turning around goes clockwise)
+TURN_TOWARD = {}
+for current in DIR_ORDER:
+    for target in DIR_ORDER:
+        if target == current:
+            TURN_TOWARD[(current, target)] = "wait"
+        elif target == CCW[current]:
+            TURN_TOWARD[(current, target)] = "turn_ccw"
+        else:
+            TURN_TOWARD[(current, target)] = "turn_cw"
+
+# In Pygame (0,0) is top-left; y increases downwards; x increases rightwards)
+DIR_VECT = {Dir.NORTH:(0,-1), Dir.EAST:(1,0), Dir.SOUTH:(0,1), Dir.WEST:(-1,0)}
+
+# Relative sensing vectors
+NORTH_SENSE = [(-1,-1),(0,-1),(1,-1),(-2,-2),(-1,-2),(0,-2),(1,-2),(2,-2)]
+EAST_SENSE = [turn_cw(v) for v in NORTH_SENSE]
+SOUTH_SENSE = [turn_cw(v) for v in EAST_SENSE]
+WEST_SENSE = [turn_cw(v) for v in SOUTH_SENSE]
+
+SENSE_VECT = {Dir.NORTH: NORTH_SENSE, Dir.EAST: EAST_SENSE, Dir.SOUTH: SOUTH_SENSE, Dir.WEST: WEST_SENSE}
+
+# Integer-coded versions of the tables above, indexed by Dir.value
+CW_CODE = [CW[d].value for d in DIR_ORDER]
+CCW_CODE = [CCW[d].value for d in DIR_ORDER]
+TURN_TOWARD_CODE = [[TURN_TOWARD[(c, t)] for t in DIR_ORDER] for c in DIR_ORDER] # [current][target]
+DIR_VECT_CODE = [DIR_VECT[d] for d in DIR_ORDER]
+SENSE_VECT_CODE = [SENSE_VECT[d] for d in DIR_ORDER]
+
+def target_dir(dx, dy):
+    """Direction of the longer axis of (dx, dy); ties go vertical, (0, 0) is NORTH."""
+    if abs(dx) > abs(dy):
+        return Dir.EAST if dx > 0 else Dir.WEST
+    return Dir.SOUTH if dy > 0 else Dir.NORTH
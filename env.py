@@ -0,0 +1,206 @@
+import os
+import time
+import random
+import contextlib
+import numpy as np
+
+from config import *
+from store import *
+from simulation import Simulation
+
+ACTIONS = DECISIONS # action index == decision code
+
+# Observation window: the robot's own tile followed by the SENSE_VECT cells, for each Dir.value
+WINDOW = np.array([[(0, 0)] + SENSE_VECT_CODE[d] for d in range(4)], dtype=np.int64) # (4, 9, 2)
+PAD = 2 # SENSE_VECT reaches 2 tiles away
+
+# Channels of the window observation
+IN_BOUNDS, GOLD, DEPOSIT, TEAMMATES, OPPONENTS = range(5)
+CHANNELS = 5
+
+class SwarmEnv:
+    """Gym-style reset()/step(actions) around a Simulation, for policies that replace Robot.plan().
+
+    Actions are one decision code per robot (see ACTIONS). Observations are written into arrays
+    allocated once, so the dict returned by reset()/step() always holds the same buffers:
+        window:   (CHANNELS, robots, 9) int16 - own tile + sensed tiles: in bounds, gold, deposit,
+                  teammates (not counting the robot itself), opponents
+        partner:  (robots, 4) int16 - has partner, partner dx, partner dy, partner Dir.value
+        carrying: (robots,) bool
+        pending:  (robots, 2) int16 - unread team messages, unread partner messages
+        mask:     (len(ACTIONS), robots) bool - actions whose preconditions hold; others are replaced by "wait"
+    Rewards are the change in the robot's team score.
+    """
+
+    def __init__(self, max_timesteps: int = 1000, quiet: bool = True, **kwargs):
+        self.max_timesteps = max_timesteps
+        self.quiet = quiet
+        self.kwargs = kwargs # passed on to Simulation
+        self.sim = None
+        self.devnull = open(os.devnull, "w")
+        n = self.robots = 2 * ROBOTS_PER_TEAM
+        size = GRID_SIZE + 2 * PAD
+
+        # observation buffers
+        self.window = np.zeros((CHANNELS, n, 9), dtype=np.int16)
+        self.partner = np.zeros((n, 4), dtype=np.int16)
+        self.carrying = np.zeros(n, dtype=bool)
+        self.pending = np.zeros((n, 2), dtype=np.int16)
+        self.mask = np.ones((len(ACTIONS), n), dtype=bool)
+        self.observation = {"window": self.window, "partner": self.partner, "carrying": self.carrying, "pending": self.pending, "mask": self.mask}
+        self.rewards = np.zeros(n, dtype=np.float32)
+
+        # padded maps (flattened) the window is gathered from
+        self.gold_map = np.zeros((GRID_SIZE, GRID_SIZE), dtype=np.int32)
+        self.gold_pad = np.zeros((size, size), dtype=np.int16)
+        self.bounds_pad = np.zeros((size, size), dtype=np.int16)
+        self.bounds_pad[PAD:-PAD, PAD:-PAD] = 1
+        self.deposit_pad = np.zeros((size, size), dtype=np.int16)
+        self.teams_pad = np.zeros((2, size, size), dtype=np.int16) # robots of each team per tile
+
+        # scratch buffers
+        self.cells = np.zeros((n, 9, 2), dtype=np.int64)
+        self.flat = np.zeros((n, 9), dtype=np.int64)
+        self.team_flat = np.zeros((n, 9), dtype=np.int64)
+        self.team_offset = np.zeros((n, 1), dtype=np.int64)
+        self.team_index = np.zeros((n, 1), dtype=np.int64)
+        self.xy = np.zeros((n, 2), dtype=np.int64)
+        self.partner_slot = np.zeros(n, dtype=np.int64)
+        self.partner_x = np.zeros(n, dtype=np.int32)
+        self.partner_y = np.zeros(n, dtype=np.int32)
+        self.partner_dir = np.zeros(n, dtype=np.int8)
+        self.has_partner = np.zeros(n, dtype=bool)
+        self.deposit_xy = np.zeros((n, 2), dtype=np.int32)
+        self.at_deposit = np.zeros((n, 2), dtype=bool)
+        self.action_index = np.zeros(n, dtype=np.int64)
+        self.valid = np.zeros(n, dtype=bool)
+        self.robot_index = np.arange(n, dtype=np.int64)
+        self.scores = np.zeros(2, dtype=np.float32)
+        self.last_scores = np.zeros(2, dtype=np.float32)
+
+    def reset(self, seed: int = None):
+        """Start a new game and return the first observation."""
+        if seed is not None:
+            random.seed(seed)
+        with self.output():
+            self.sim = Simulation(use_store=True, **self.kwargs)
+            self.sim.log_messages = not self.quiet
+            self.sim.grid.attach_gold_map(self.gold_map)
+            for robot in self.sim.grid.robots:
+                robot.sense()
+        self.deposit_pad[:] = 0
+        for i, robot in enumerate(self.sim.grid.robots):
+            self.deposit_xy[i] = robot.kb.deposit
+        for (x, y), tile in self.sim.grid.tiles.items():
+            if tile.deposit:
+                self.deposit_pad[x + PAD, y + PAD] = 1
+        self.last_scores[:] = 0
+        self.encode()
+        return self.observation
+
+    def step(self, actions):
+        """Act with one decision code per robot; returns (observation, rewards, done, info)."""
+        sim = self.sim
+        store = sim.grid.store
+        robots = sim.grid.robots
+        with self.output():
+            start = time.perf_counter()
+            for robot in robots:
+                robot.timestep = sim.timestep
+                robot.sense()
+            store.decision[:self.robots] = actions
+            self.mask_actions(store.decision[:self.robots])
+            for robot in robots:
+                robot.read_message()
+            store.execute(robots)
+            sim.end_step(start)
+
+        self.scores[0] = sim.grid.scores[Team.RED]
+        self.scores[1] = sim.grid.scores[Team.BLUE]
+        np.subtract(self.scores, self.last_scores, out=self.last_scores)
+        np.take(self.last_scores, store.team[:self.robots], out=self.rewards)
+        self.last_scores[:] = self.scores
+        self.encode()
+        done = sim.finished() or sim.timestep >= self.max_timesteps
+        return self.observation, self.rewards, done, {"timestep": sim.timestep}
+
+    def mask_actions(self, decision):
+        """Replace actions whose preconditions do not hold with "wait"."""
+        np.multiply(decision, self.robots, out=self.action_index)
+        self.action_index += self.robot_index
+        np.take(self.mask, self.action_index, out=self.valid)
+        np.logical_not(self.valid, out=self.valid)
+        decision[self.valid] = DECISION_CODE["wait"]
+
+    def output(self):
+        if self.quiet:
+            return contextlib.redirect_stdout(self.devnull)
+        return contextlib.nullcontext()
+
+    def encode(self):
+        """Write the current world state into the observation buffers."""
+        store = self.sim.grid.store
+        n = self.robots
+        size = GRID_SIZE + 2 * PAD
+        pos = store.pos[:n]
+        team = store.team[:n]
+
+        # maps
+        self.gold_pad[PAD:-PAD, PAD:-PAD] = self.gold_map
+        self.teams_pad.fill(0)
+        np.add(pos, PAD, out=self.xy)
+        np.add.at(self.teams_pad, (team, self.xy[:, 0], self.xy[:, 1]), 1)
+
+        # window cells as flat indices into the padded maps
+        np.take(WINDOW, store.dir[:n], axis=0, out=self.cells)
+        self.cells += self.xy[:, None, :]
+        np.multiply(self.cells[:, :, 0], size, out=self.flat)
+        self.flat += self.cells[:, :, 1]
+        np.take(self.bounds_pad, self.flat, out=self.window[IN_BOUNDS])
+        np.take(self.gold_pad, self.flat, out=self.window[GOLD])
+        np.take(self.deposit_pad, self.flat, out=self.window[DEPOSIT])
+        np.copyto(self.team_index[:, 0], team)
+        np.multiply(self.team_index, size * size, out=self.team_offset)
+        np.add(self.flat, self.team_offset, out=self.team_flat)
+        np.take(self.teams_pad, self.team_flat, out=self.window[TEAMMATES])
+        self.window[TEAMMATES, :, 0] -= 1 # not counting the robot itself
+        np.subtract(size * size, self.team_offset, out=self.team_offset) # offset of the other team's map
+        np.add(self.flat, self.team_offset, out=self.team_flat)
+        np.take(self.teams_pad, self.team_flat, out=self.window[OPPONENTS])
+
+        # partner
+        partner = store.partner[:n]
+        np.greater_equal(partner, 0, out=self.has_partner)
+        np.maximum(partner, 0, out=self.partner_slot)
+        np.take(store.pos[:n, 0], self.partner_slot, out=self.partner_x)
+        np.take(store.pos[:n, 1], self.partner_slot, out=self.partner_y)
+        np.take(store.dir[:n], self.partner_slot, out=self.partner_dir)
+        self.partner[:, 0] = self.has_partner
+        np.subtract(self.partner_x, pos[:, 0], out=self.partner[:, 1])
+        np.subtract(self.partner_y, pos[:, 1], out=self.partner[:, 2])
+        self.partner[:, 3] = self.partner_dir
+        self.partner[:, 1:] *= self.has_partner[:, None]
+
+        np.copyto(self.carrying, store.carrying[:n])
+
+        # action mask (protocol steps need a partner / gold in hand / the deposit)
+        mask = self.mask
+        np.logical_not(self.carrying, out=mask[DECISION_CODE["plan_pickup"]])
+        mask[DECISION_CODE["plan_pickup"]] &= self.has_partner
+        mask[DECISION_CODE["pickup_gold"]] = mask[DECISION_CODE["plan_pickup"]]
+        np.equal(pos, self.deposit_xy, out=self.at_deposit)
+        np.logical_and(self.at_deposit[:, 0], self.at_deposit[:, 1], out=mask[DECISION_CODE["deposit_gold"]])
+        mask[DECISION_CODE["deposit_gold"]] &= self.carrying
+        mask[DECISION_CODE["deposit_gold"]] &= self.has_partner
+        np.logical_not(self.has_partner, out=mask[DECISION_CODE["pair_up"]])
+
+        # unread messages
+        for i, robot in enumerate(self.sim.grid.robots):
+            team_pending = 0
+            for messages in robot.kb.received_messages.values():
+                team_pending += len(messages)
+            partner_pending = 0
+            for messages in robot.kb.received_partner_messages.values():
+                partner_pending += len(messages)
+            self.pending[i, 0] = team_pending
+            self.pending[i, 1] = partner_pending
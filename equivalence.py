@@ -0,0 +1,234 @@
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import subprocess
+import contextlib
+from enum import Enum
+
+"""
+Differential testing: step a reference engine and alternative engines on the same seeds, compare the
+full world state after every timestep and report the first divergence as a minimal diff.
+
+The reference is the plain Simulation() of a pinned checkout, run in its own interpreter: --reference
+is required and takes a checkout path or a git revision of this repository (e.g. the commit before
+an optimization), which is checked out into a temporary worktree for the run. Comparing against
+this tree itself would only check the code against itself. Engines are Simulation keyword arguments
+of this tree. Each engine draws from its own copy of the random stream, so engines stepped side by
+side in one process see the same random numbers.
+
+    python equivalence.py --reference HEAD~1 --seeds 4 --steps 1500 --engine '{}' --engine '{"use_store": true}'
+    python equivalence.py --reference /tmp/before --engine '{"use_scheduler": true}'
+"""
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1") # keeps the dump stream clean
+
+MAX_DIFFS = 10 # differences shown for a divergence
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEVNULL = open(os.devnull, "w")
+
+def value(v, ref):
+    """v as plain JSON values; robots become their index in grid.robots."""
+    if isinstance(v, Enum):
+        return v.name
+    if isinstance(v, (list, tuple)):
+        return [value(x, ref) for x in v]
+    if isinstance(v, dict):
+        return {str(value(k, ref)): value(x, ref) for k, x in v.items()}
+    if v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    if hasattr(v, "actions"): # an ActionScript, compared as the action list older trees use
+        return value(v.actions(), ref)
+    if hasattr(v, "kb"): # a robot
+        return ref(v)
+    return repr(v)
+
+def snapshot(sim):
+    """The world state of sim: scores, gold, tile occupants and every robot's state and KB."""
+    grid = sim.grid
+    index = {robot: i for i, robot in enumerate(grid.robots)}
+    ref = lambda robot: index.get(robot, -1) if robot is not None else None
+
+    def messages(boxes):
+        return {mtype: [[m.timestep, value(m.content, ref), ref(m.proposer), ref(m.acceptor), m.countdown] for m in box] for mtype, box in boxes.items() if box}
+
+    robots = []
+    for robot in grid.robots:
+        kb = robot.kb
+        decision = robot.decision
+        robots.append({
+            "pos": value(robot.pos, ref),
+            "dir": robot.dir.name,
+            "decision": decision[0] if isinstance(decision, (list, tuple)) else decision, # older trees override with ["wait", pos]
+            "carrying": bool(robot.carrying),
+            "partner": ref(robot.partner),
+            "pros_partner": ref(robot.pros_partner),
+            "seeking_help": robot.seeking_help,
+            "offering_help": robot.offering_help,
+            "target": value(robot.target_position, ref),
+            "pickup_proposed": robot.pickup_proposed,
+            "pickup_t_sync": robot.pickup_t_sync,
+            "move_sync_pending": value(robot.move_sync_pending, ref),
+            "move_sync_plan": value(robot.move_sync_plan, ref),
+            "move_sync_proposed": robot.move_sync_proposed,
+            "sensed_gold": {f"{x},{y}": info["gold"] for (x, y), info in sorted(kb.sensed.items())},
+            "received": messages(kb.received_messages),
+            "read": messages(kb.read_messages),
+            "received_partner": messages(kb.received_partner_messages),
+            "read_partner": messages(kb.read_partner_messages),
+        })
+    return json.loads(json.dumps({
+        "timestep": sim.timestep,
+        "scores": [grid.scores[team] for team in sorted(grid.scores, key=lambda team: team.value)],
+        "gold": {f"{x},{y}": tile.gold for (x, y), tile in sorted(grid.tiles.items()) if tile.gold},
+        "tile_robots": {f"{x},{y}": [ref(robot) for robot in tile.robots] for (x, y), tile in sorted(grid.tiles.items()) if tile.robots},
+        "robots": robots,
+    }))
+
+class Engine:
+    """A Simulation with its own random stream, stepped quietly."""
+
+    def __init__(self, seed: int, kwargs: dict):
+        from simulation import Simulation
+
+        saved = random.getstate()
+        random.seed(seed)
+        with quiet():
+            self.sim = Simulation(**kwargs)
+        self.sim.log_messages = False
+        self.random_state = random.getstate()
+        random.setstate(saved)
+
+    def step(self):
+        """Step once and return the snapshot."""
+        saved = random.getstate()
+        random.setstate(self.random_state)
+        with quiet():
+            self.sim.step()
+        self.random_state = random.getstate()
+        random.setstate(saved)
+        return snapshot(self.sim)
+
+class External:
+    """Snapshots of the reference engine of another checkout, streamed from a child interpreter."""
+
+    def __init__(self, root: str, seed: int, steps: int, kwargs: dict):
+        command = [sys.executable, os.path.abspath(__file__), "dump", root, str(seed), str(steps), json.dumps(kwargs)]
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+
+    def step(self):
+        return json.loads(self.process.stdout.readline())
+
+    def close(self):
+        self.process.kill()
+        self.process.wait()
+
+def quiet():
+    return contextlib.redirect_stdout(DEVNULL)
+
+def flatten(state, path=""):
+    """{path: leaf value} of a snapshot."""
+    if isinstance(state, dict):
+        items = state.items()
+    elif isinstance(state, list):
+        items = enumerate(state)
+    else:
+        return {path: state}
+    flat = {}
+    for key, v in items:
+        flat.update(flatten(v, f"{path}[{key}]" if isinstance(key, int) else f"{path}.{key}" if path else key))
+    return flat
+
+def diff(reference, other):
+    """[(path, reference value, other value)] of the leaves that differ."""
+    a, b = flatten(reference), flatten(other)
+    missing = "<missing>"
+    return [(path, a.get(path, missing), b.get(path, missing)) for path in sorted(set(a) | set(b)) if a.get(path, missing) != b.get(path, missing)]
+
+def compare(seed: int, steps: int, engines: list, reference: str = None, reference_kwargs: dict = None):
+    """Step the reference (checkout path; None: this tree, in process) and the engines (lists of Simulation kwargs) together.
+
+    Returns {engine index: (step, differences)} for the engines that diverged; the rest matched for all steps.
+    """
+    reference_kwargs = reference_kwargs or {}
+    ref = External(reference, seed, steps, reference_kwargs) if reference else Engine(seed, reference_kwargs)
+    running = {i: Engine(seed, kwargs) for i, kwargs in enumerate(engines)}
+    diverged = {}
+    try:
+        for step in range(steps):
+            if not running:
+                break
+            expected = ref.step()
+            for i, engine in list(running.items()):
+                state = engine.step()
+                if state != expected:
+                    diverged[i] = (step, diff(expected, state))
+                    del running[i]
+    finally:
+        if reference:
+            ref.close()
+    return diverged
+
+def checkout(revision: str):
+    """A temporary detached worktree of revision of this repository (see remove_checkout)."""
+    path = tempfile.mkdtemp(prefix="reference-")
+    try:
+        subprocess.run(["git", "-C", ROOT, "worktree", "add", "--detach", path, revision], check=True, capture_output=True)
+    except subprocess.CalledProcessError:
+        os.rmdir(path)
+        raise
+    return path
+
+def remove_checkout(path: str):
+    subprocess.run(["git", "-C", ROOT, "worktree", "remove", "--force", path], check=True, capture_output=True)
+
+def dump(root: str, seed: int, steps: int, kwargs: dict):
+    """Print one snapshot per step of the reference engine in root (used by External)."""
+    sys.path.insert(0, os.path.abspath(root))
+    engine = Engine(seed, kwargs)
+    for step in range(steps):
+        print(json.dumps(engine.step()), flush=True)
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "dump":
+        dump(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), json.loads(sys.argv[5]))
+        return
+
+    parser = argparse.ArgumentParser(description="Compare engines against a reference, timestep by timestep")
+    parser.add_argument("--seeds", type=int, default=4)
+    parser.add_argument("--steps", type=int, default=1500)
+    parser.add_argument("--engine", action="append", default=[], help="Simulation kwargs as JSON; repeatable")
+    parser.add_argument("--reference", required=True, help="checkout path or git revision whose Simulation is the reference")
+    parser.add_argument("--reference-kwargs", default="{}")
+    args = parser.parse_args()
+
+    from config import ANSI
+    engines = [json.loads(engine) for engine in args.engine] or [{"use_store": True}]
+    reference = args.reference
+    if not os.path.isdir(reference):
+        try:
+            reference = checkout(reference)
+        except subprocess.CalledProcessError:
+            parser.error(f"--reference {reference} is neither a directory nor a git revision")
+    failed = False
+    try:
+        for seed in range(args.seeds):
+            diverged = compare(seed, args.steps, engines, reference, json.loads(args.reference_kwargs))
+            for i, kwargs in enumerate(engines):
+                if i not in diverged:
+                    print(ANSI.GREEN.value + f"seed {seed} {kwargs}: identical for {args.steps} steps" + ANSI.RESET.value)
+                    continue
+                failed = True
+                step, differences = diverged[i]
+                print(ANSI.RED.value + f"seed {seed} {kwargs}: diverged at step {step} ({len(differences)} differences)" + ANSI.RESET.value)
+                for path, expected, got in differences[:MAX_DIFFS]:
+                    print(f"  {path}: {expected!r} != {got!r}")
+    finally:
+        if reference != args.reference:
+            remove_checkout(reference)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import numpy as np
+import pygame
+
+from config import *
+
+LAYERS = ["visits", "restriction_waits", "drops", "restricted"]
+
+class Heatmaps:
+    """Per-tile event counters, indexed [x,y], each updated in O(1) as the event happens.
+
+        visits:            robots entering the tile
+        restriction_waits: robots that waited instead of moving onto the tile because it is restricted
+        drops:             gold dropped on the tile by a pair that got split (Grid.check_gold)
+        restricted:        timesteps the tile spent restricted (from the restriction to the unrestriction)
+    """
+
+    def __init__(self, size: int = GRID_SIZE):
+        for layer in LAYERS:
+            setattr(self, layer, np.zeros((size, size), dtype=np.int64))
+        self.restricted_since = {} # {(x,y): timestep it was restricted}
+
+    def visit(self, pos):
+        self.visits[pos[0], pos[1]] += 1
+
+    def restriction_wait(self, pos):
+        self.restriction_waits[pos[0], pos[1]] += 1
+
+    def drop(self, pos):
+        self.drops[pos[0], pos[1]] += 1
+
+    def restrict(self, pos, timestep):
+        self.restricted_since.setdefault(tuple(pos), timestep)
+
+    def unrestrict(self, pos, timestep):
+        since = self.restricted_since.pop(tuple(pos), None)
+        if since is not None:
+            self.restricted[pos[0], pos[1]] += timestep - since
+
+    def arrays(self, timestep: int = None):
+        """{layer: copy of its array}; restrictions still open count up to timestep, if given."""
+        arrays = {layer: getattr(self, layer).copy() for layer in LAYERS}
+        if timestep is not None:
+            for (x, y), since in self.restricted_since.items():
+                arrays["restricted"][x, y] += timestep - since
+        return arrays
+
+    def save(self, path, timestep: int = None):
+        np.savez_compressed(path, **self.arrays(timestep))
+
+    def draw(self, screen, layer, timestep: int = None):
+        """Shade every tile by its count in layer, relative to the busiest tile."""
+        counts = self.arrays(timestep)[layer]
+        top = counts.max()
+        if top == 0:
+            return
+        overlay = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
+        xs, ys = counts.nonzero()
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            overlay.fill((255, 0, 0, int(40 + 160 * counts[x, y] / top)))
+            screen.blit(overlay, (x * CELL_SIZE, y * CELL_SIZE + SCORES_HEIGHT))
+        font = pygame.font.SysFont(None, 20)
+        label = font.render(f"{layer} (max {top})", True, BLACK)
+        screen.blit(label, (X_WINDOW_SIZE - label.get_width() - 8, 8))
@@ -2,12 +2,14 @@ import pygame
 import sys
 from config import X_WINDOW_SIZE, Y_WINDOW_SIZE
 from simulation import Simulation
+from heatmap import LAYERS
 from robot import *
 
 def main():
     pygame.init()
     screen = pygame.display.set_mode(( X_WINDOW_SIZE, Y_WINDOW_SIZE))
-    sim = Simulation()
+    sim = Simulation(use_heatmaps=True)
+    layers = [None] + LAYERS # H cycles through the heatmap overlays
 
     while True:  
         for event in pygame.event.get():
@@ -16,6 +18,8 @@ def main():
                 sys.exit()
             if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
                 sim.step()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_h:
+                sim.heatmap_layer = layers[(layers.index(sim.heatmap_layer) + 1) % len(layers)]
         sim.draw(screen)
         pygame.display.flip()
 
@@ -0,0 +1,66 @@
+from config import *
+from robot import Message
+
+class Matchmaker:
+    """Central service pairing robots that ask for help with the nearest free teammate.
+
+    Instead of broadcasting please_help to the whole team, a robot registers its request here.
+    Once per timestep (after planning) match() greedily gives every open request, oldest first, the
+    free teammate closest to it by grid distance.
+    The helper gets a targeted please_help, and a help_cancel if the request closes before it pairs.
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.requests = {} # {seeker: (x,y)} open help requests, oldest first
+        self.assigned = {} # {seeker: helper}
+        self.helping = {}  # {helper: seeker}
+
+    def request(self, seeker):
+        """Open (or keep open) a help request at the seeker's position."""
+        self.requests.setdefault(seeker, seeker.cell)
+
+    def close(self, seeker):
+        self.unassign(seeker)
+        del self.requests[seeker]
+
+    def unassign(self, seeker):
+        """Take the request back from its helper, if it has one."""
+        helper = self.assigned.pop(seeker, None)
+        if helper:
+            del self.helping[helper]
+            # sent with the longest delay so it is never read before the assignment it cancels
+            cancel = Message(timestep=seeker.timestep, mtype="help_cancel", content=self.requests[seeker], proposer=seeker, acceptor=helper, countdown=MESSAGE_DELAY[1])
+            if self.grid.network: # the network's longest delay, for the same reason
+                self.grid.network.send(cancel, helper, delay=self.grid.network.max_delay())
+            else:
+                helper.receive_message(cancel)
+
+    def is_free(self, robot):
+        return not (robot.partner or robot.carrying or robot.seeking_help or robot.offering_help or robot in self.helping or robot in self.requests)
+
+    def nearest_free(self, team, pos):
+        """Free robot of team closest to pos (grid distance, then lowest id), or None."""
+        free = [robot for robot in self.grid.robots if robot.team == team and self.is_free(robot)]
+        if not free:
+            return None
+        return min(free, key=lambda robot: (abs(robot.pos[0] - pos[0]) + abs(robot.pos[1] - pos[1]), robot.id))
+
+    def match(self):
+        """Drop requests that no longer hold, release helpers that got busy, and assign the open requests."""
+        for seeker, pos in list(self.requests.items()):
+            if seeker.partner or not seeker.seeking_help or seeker.cell != pos:
+                self.close(seeker)
+        for helper, seeker in list(self.helping.items()):
+            if helper.partner or helper.carrying or helper.seeking_help:
+                self.unassign(seeker)
+
+        for seeker, pos in self.requests.items():
+            if seeker in self.assigned:
+                continue
+            helper = self.nearest_free(seeker.team, pos)
+            if helper:
+                self.assigned[seeker] = helper
+                self.helping[helper] = seeker
+                seeker.send_message(Message(timestep=seeker.timestep, mtype="please_help", content=pos), helper)
+                print(ANSI.CYAN.value + f"Matchmaker: Robot {helper.id} assigned to help Robot {seeker.id} at {pos}" + ANSI.RESET.value)
@@ -0,0 +1,144 @@
+import csv
+import gc
+import json
+import os
+import sys
+import queue
+import socket
+import threading
+from config import *
+
+FIELDS = ["timestep", "score_red", "score_blue", "gold_on_map", "gold_in_transit", "carrying_pairs", "pending_messages", "step_latency", "allocated_blocks", "gc_collections"]
+
+def gc_collections():
+    return sum(generation["collections"] for generation in gc.get_stats())
+
+class MetricsStream:
+    """Hands a metrics record to a sink every `every` timesteps.
+
+    Records go through a bounded queue to a background thread that does the writing, so step()
+    never waits on the sink; if the sink falls behind, records are dropped (and counted) instead.
+    """
+
+    def __init__(self, sink, every: int = 1, maxsize: int = 10000):
+        self.sink = sink
+        self.every = every
+        self.dropped = 0
+        self.blocks = sys.getallocatedblocks() # allocation counters at the previous record
+        self.collections = gc_collections()
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def record(self, sim, step_latency: float):
+        """Queue a record for the timestep sim just finished (every N timesteps)."""
+        timestep = sim.timestep - 1
+        if timestep % self.every != 0:
+            return
+        grid = sim.grid
+        pending = 0
+        for robot in grid.robots:
+            for messages in robot.kb.received_messages.values():
+                pending += len(messages)
+            for messages in robot.kb.received_partner_messages.values():
+                pending += len(messages)
+        blocks, collections = sys.getallocatedblocks(), gc_collections()
+        record = {
+            "timestep": timestep,
+            "score_red": grid.scores[Team.RED],
+            "score_blue": grid.scores[Team.BLUE],
+            "gold_on_map": grid.gold_on_map,
+            "gold_in_transit": grid.gold_in_transit(),
+            "carrying_pairs": len(grid.carrying_pairs()),
+            "pending_messages": pending,
+            "step_latency": step_latency,
+            "allocated_blocks": blocks - self.blocks, # net memory blocks allocated since the previous record
+            "gc_collections": collections - self.collections, # garbage collector runs since the previous record
+        }
+        self.blocks, self.collections = blocks, collections
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def write_loop(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                break
+            self.sink.write(record)
+
+    def close(self):
+        """Flush the queued records and close the sink."""
+        self.queue.put(None)
+        self.thread.join()
+        self.sink.close()
+
+class GeneratorSink:
+    """Sink read back as a generator: `for record in sink.records(): ...` (ends when the stream closes)."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def write(self, record):
+        self.queue.put(record)
+
+    def close(self):
+        self.queue.put(None)
+
+    def records(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                return
+            yield record
+
+class CSVSink:
+    """Writes records to CSV files, starting a new file every `rows_per_file` rows (metrics_0000.csv, ...)."""
+
+    def __init__(self, directory: str, prefix: str = "metrics", rows_per_file: int = 100000):
+        self.directory = directory
+        self.prefix = prefix
+        self.rows_per_file = rows_per_file
+        self.file_index = 0
+        self.rows = 0
+        self.file = None
+        self.writer = None
+        os.makedirs(directory, exist_ok=True)
+
+    def rotate(self):
+        if self.file:
+            self.file.close()
+        path = os.path.join(self.directory, f"{self.prefix}_{self.file_index:04d}.csv")
+        self.file_index += 1
+        self.rows = 0
+        self.file = open(path, "w", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+        self.writer.writeheader()
+
+    def write(self, record):
+        if self.file is None or self.rows >= self.rows_per_file:
+            self.rotate()
+        self.writer.writerow(record)
+        self.rows += 1
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+class SocketSink:
+    """Sends each record as one JSON datagram to a local UDP port (nothing needs to be listening)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9999):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def write(self, record):
+        try:
+            self.sock.sendto(json.dumps(record).encode(), self.address)
+        except OSError:
+            pass # no listener; metrics are best effort
+
+    def close(self):
+        self.sock.close()
@@ -0,0 +1,80 @@
+from functools import lru_cache
+
+from config import *
+from direction import *
+
+"""
+Action scripts for synced moves: the actions a carrying pair takes from its position to its
+deposit, run-length encoded as one int per run of equal actions (count << 2 | action code).
+A straight haul of 40 move_forward is one int instead of a 40-element list.
+
+Scripts are immutable, so one script is shared by the sync message, both partners' plans and the
+cache. Robots walk a script with a cursor (run, offset) that advances in O(1) per step.
+"""
+
+ACTIONS = ["move_forward", "turn_cw", "turn_ccw", "deposit_gold"]
+ACTION_CODE = {action: code for code, action in enumerate(ACTIONS)}
+
+class ActionScript:
+    __slots__ = ("runs", "length")
+
+    def __init__(self, runs: tuple):
+        self.runs = runs # (count << 2 | ACTION_CODE, ...)
+        self.length = sum(run >> 2 for run in runs)
+
+    def action(self, run: int):
+        return ACTIONS[self.runs[run] & 3]
+
+    def advance(self, run: int, offset: int):
+        """The cursor after (run, offset)."""
+        offset += 1
+        if offset == self.runs[run] >> 2:
+            return run + 1, 0
+        return run, offset
+
+    def actions(self):
+        return [ACTIONS[run & 3] for run in self.runs for _ in range(run >> 2)]
+
+    def __len__(self):
+        return self.length
+
+    def __eq__(self, other):
+        return isinstance(other, ActionScript) and self.runs == other.runs
+
+    def __hash__(self):
+        return hash(self.runs)
+
+    def __repr__(self):
+        return repr(self.actions()) # logs read the same as the plain action lists did
+
+@lru_cache(maxsize=65536)
+def moves_to_deposit(pos: tuple, direction: Dir, deposit: tuple):
+    """ActionScript taking a robot at pos facing direction to deposit: along x first, then y, then deposit_gold."""
+    runs = []
+    def add(code, count=1):
+        if runs and runs[-1] & 3 == code:
+            runs[-1] += count << 2
+        else:
+            runs.append(count << 2 | code)
+
+    x, y = pos
+    direction = direction.value # the turn tables below are indexed by Dir.value
+    for axis in [0, 1]:
+        distance = deposit[axis] - (x, y)[axis]
+        if distance == 0:
+            continue
+        if axis == 0:
+            target = (Dir.EAST if distance > 0 else Dir.WEST).value
+        else:
+            target = (Dir.SOUTH if distance > 0 else Dir.NORTH).value
+        while direction != target:
+            move = TURN_TOWARD_CODE[direction][target]
+            add(ACTION_CODE[move])
+            direction = CW_CODE[direction] if move == "turn_cw" else CCW_CODE[direction]
+        add(ACTION_CODE["move_forward"], abs(distance)) # deposits are on the grid, so every step lands
+        if axis == 0:
+            x = deposit[0]
+        else:
+            y = deposit[1]
+    add(ACTION_CODE["deposit_gold"])
+    return ActionScript(tuple(runs))
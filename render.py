@@ -0,0 +1,244 @@
+import os
+import queue
+import shutil
+import argparse
+import threading
+import subprocess
+import numpy as np
+import pygame
+
+from config import *
+from direction import DIR_VECT_CODE
+
+"""
+Offline rendering of runs to PNG sequences or video, without a display.
+
+The simulation loop only takes a snapshot (gold array, scores, robot cells and colours) every
+`every` timesteps. A background thread rasterizes each snapshot into a NumPy frame and encodes it:
+  - the background (tile borders, deposits) is drawn once and copied into every frame
+  - all gold is drawn in one fancy-indexed assignment (nugget pixel offsets added to every gold tile)
+  - each robot's disc is stamped into its slot of the tile by array slicing
+Frames use the colours and layout of Simulation.draw, at CELL_SIZE * scale pixels per tile.
+
+    recorder = sim.record_frames("runs/seed0", every=10, scale=0.5)     # frame_0000000.png, ...
+    recorder = sim.record_frames("runs/seed0.mp4", fps=30)              # needs ffmpeg on the PATH
+    sim.run(quiet=True); recorder.close()
+
+    python render.py runs/seed0.mp4 --steps 100000 --every 20 --scale 0.25
+"""
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".webm", ".avi", ".mov", ".gif")
+
+def disc(size, radius, centre=None):
+    """size x size boolean mask of a disc around (centre, centre), by default the middle pixel."""
+    centre = size // 2 if centre is None else centre
+    xs, ys = np.ogrid[:size, :size]
+    return (xs - centre) ** 2 + (ys - centre) ** 2 <= radius ** 2
+
+class FrameRenderer:
+    """Rasterizes snapshots into (height, width, 3) uint8 arrays: rows of RGB pixels, ready to encode."""
+
+    def __init__(self, scale: float = 1.0):
+        self.cell = max(4, int(round(CELL_SIZE * scale)))
+        self.bar = max(1, int(round(SCORES_HEIGHT * scale)))
+        self.width = GRID_SIZE * self.cell
+        self.height = GRID_SIZE * self.cell + self.bar
+        self.font_size = max(8, int(round(24 * scale)))
+        self.margin = int(round(8 * scale))
+        self.font = None
+        self.labels = {} # {scores text: pixel array}
+        cell = self.cell
+
+        # Background: white, tile borders, deposits
+        self.background = np.full((self.height, self.width, 3), WHITE, dtype=np.uint8)
+        grid = self.background[self.bar:]
+        grid[::cell] = BLACK
+        grid[cell - 1::cell] = BLACK
+        grid[:, ::cell] = BLACK
+        grid[:, cell - 1::cell] = BLACK
+        self.deposit_size = max(1, cell - 4)
+
+        # Gold: pixel offsets of a nugget within its tile
+        self.nugget_y, self.nugget_x = np.nonzero(disc(cell, cell // 6))
+
+        # Robots: a disc in one quadrant of the tile, plus a dot on the side it faces
+        self.robot_radius = cell // 5
+        self.robot_sprite = disc(2 * self.robot_radius + 1, self.robot_radius)
+        self.dot_radius = max(1, cell // 20)
+        self.dot_sprite = disc(2 * self.dot_radius + 1, self.dot_radius)
+
+    def draw_deposits(self, cells):
+        for x, y in cells:
+            px, py = x * self.cell + 2, y * self.cell + 2 + self.bar
+            self.background[py:py + self.deposit_size, px:px + self.deposit_size] = DEPOSIT_COL
+
+    def stamp(self, frame, sprite, cx, cy, colour):
+        r = sprite.shape[0] // 2
+        x0, y0 = cx - r, cy - r
+        sx, sy = max(0, -x0), max(0, -y0)
+        region = frame[max(0, y0):min(y0 + sprite.shape[0], self.height), max(0, x0):min(x0 + sprite.shape[1], self.width)]
+        region[sprite[sy:sy + region.shape[0], sx:sx + region.shape[1]]] = colour
+
+    def label(self, text):
+        if text not in self.labels:
+            if self.font is None:
+                pygame.font.init()
+                self.font = pygame.font.Font(None, self.font_size)
+            surface = self.font.render(text, True, BLACK, WHITE)
+            self.labels[text] = pygame.surfarray.array3d(surface).transpose(1, 0, 2)
+        return self.labels[text]
+
+    def render(self, snapshot):
+        timestep, scores, gold, robots = snapshot
+        frame = self.background.copy()
+        cell = self.cell
+
+        # Scores
+        text = self.label(f"Scores - Red: {scores[0]}   Blue: {scores[1]}")
+        m = self.margin
+        h, w = min(text.shape[0], self.bar - m), min(text.shape[1], self.width - m)
+        frame[m:m + h, m:m + w] = text[:h, :w]
+
+        # Gold: every nugget pixel of every tile with gold, in one assignment
+        xs, ys = np.nonzero(gold)
+        rows = (ys * cell + self.bar)[:, None] + self.nugget_y
+        cols = (xs * cell)[:, None] + self.nugget_x
+        frame[rows, cols] = YELLOW
+
+        # Robots
+        for x, y, slot, colour, direction in robots:
+            cx = x * cell + (3 * cell // 4 if slot & 2 else cell // 4) # blue on the right
+            cy = y * cell + (3 * cell // 4 if slot & 1 else cell // 4) + self.bar # second robot at the bottom
+            self.stamp(frame, self.robot_sprite, cx, cy, colour)
+            dx, dy = DIR_VECT_CODE[direction]
+            self.stamp(frame, self.dot_sprite, cx + dx * self.robot_radius, cy + dy * self.robot_radius, BLACK)
+        return frame
+
+def snapshot(sim):
+    """What a frame shows, copied out of sim after a step: (timestep just finished, scores, gold array, robots)."""
+    grid = sim.grid
+    robots = []
+    for cell in dict.fromkeys(robot.cell for robot in grid.robots): # same slots as Simulation.draw_robots
+        counts = {Team.RED: 0, Team.BLUE: 0}
+        for robot in grid.tiles[cell].robots:
+            team = robot.team
+            if counts[team] < 2: # at most two robots per team are drawn on a tile
+                carrying = robot.carrying
+                if team == Team.RED:
+                    colour = DARK_RED if carrying else RED
+                else:
+                    colour = DARK_BLUE if carrying else BLUE
+                robots.append((cell[0], cell[1], counts[team] | (team == Team.BLUE) << 1, colour, robot.dir.value))
+                counts[team] += 1
+    return (sim.timestep - 1, (grid.scores[Team.RED], grid.scores[Team.BLUE]), grid.gold_map.copy(), robots)
+
+class FrameRecorder:
+    """Renders and encodes snapshots on a background thread (see Simulation.record_frames).
+
+    path is a directory for a PNG sequence, or a file with a video extension (encoded by ffmpeg).
+    The snapshot queue is bounded; when the encoder falls behind, the simulation waits for it
+    instead of losing frames. If the encoder fails (e.g. ffmpeg exits), the next record() or
+    close() raises instead of waiting forever.
+    """
+
+    def __init__(self, sim, path: str, every: int = 1, scale: float = 1.0, fps: int = 30, maxsize: int = 64):
+        self.path = path
+        self.every = every
+        self.frames = 0
+        self.renderer = FrameRenderer(scale)
+        self.renderer.draw_deposits([pos for pos, tile in sim.grid.tiles.items() if tile.deposit])
+        if sim.grid.gold_map is None:
+            sim.grid.attach_gold_map(np.zeros((GRID_SIZE, GRID_SIZE), dtype=np.int32))
+
+        self.video = None
+        if path.lower().endswith(VIDEO_EXTENSIONS):
+            ffmpeg = shutil.which("ffmpeg")
+            if ffmpeg is None:
+                raise RuntimeError("Video output needs ffmpeg on the PATH; give a directory for a PNG sequence instead")
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            size = f"{self.renderer.width}x{self.renderer.height}"
+            self.video = subprocess.Popen([ffmpeg, "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", size, "-r", str(fps), "-i", "-",
+                                           "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p", path], stdin=subprocess.PIPE)
+        else:
+            os.makedirs(path, exist_ok=True)
+
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.error = None # exception that stopped the encoder thread
+        self.thread = threading.Thread(target=self.encode_loop, daemon=True)
+        self.thread.start()
+
+    def record(self, sim):
+        """Queue a frame of the state after the timestep sim just finished (every N timesteps)."""
+        if (sim.timestep - 1) % self.every != 0:
+            return
+        self.put(snapshot(sim))
+
+    def put(self, item):
+        """Queue item for the encoder, waiting while the queue is full and the encoder is still running."""
+        while True:
+            self.check()
+            if not self.thread.is_alive():
+                raise RuntimeError("The frame recorder is closed")
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def check(self):
+        """Re-raise the encoder's failure in the simulation's thread."""
+        if self.error is not None:
+            raise RuntimeError(f"Encoding frames to {self.path} failed after {self.frames} frames") from self.error
+
+    def encode_loop(self):
+        try:
+            while True:
+                snapshot = self.queue.get()
+                if snapshot is None:
+                    break
+                frame = self.renderer.render(snapshot)
+                if self.video:
+                    self.video.stdin.write(frame.data)
+                else:
+                    pygame.image.save(pygame.image.frombuffer(frame.data, (self.renderer.width, self.renderer.height), "RGB"), os.path.join(self.path, f"frame_{snapshot[0]:07d}.png"))
+                self.frames += 1
+        except Exception as error: # e.g. BrokenPipeError when ffmpeg exits
+            self.error = error
+
+    def close(self):
+        """Encode the queued frames and finish the output."""
+        if self.thread.is_alive():
+            self.put(None)
+            self.thread.join()
+        if self.video:
+            try:
+                self.video.stdin.close()
+            except BrokenPipeError: # ffmpeg is gone; its exit code is reported below
+                pass
+            code = self.video.wait()
+            if code != 0 and self.error is None:
+                self.error = subprocess.CalledProcessError(code, "ffmpeg")
+        self.check()
+
+if __name__ == "__main__":
+    import time
+    import random
+    from simulation import Simulation
+
+    parser = argparse.ArgumentParser(description="Record a headless run to a PNG sequence or video")
+    parser.add_argument("path", help="directory for PNG frames, or a video file (.mp4, ...)")
+    parser.add_argument("--steps", type=int, default=100000)
+    parser.add_argument("--every", type=int, default=1)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    sim = Simulation()
+    start = time.perf_counter()
+    recorder = sim.record_frames(args.path, every=args.every, scale=args.scale, fps=args.fps)
+    sim.run(max_timesteps=args.steps, quiet=True)
+    recorder.close()
+    print(ANSI.GREEN.value + f"{recorder.frames} frames of {sim.timestep} timesteps to {args.path} in {time.perf_counter() - start:.1f}s" + ANSI.RESET.value)
@@ -2,6 +2,7 @@ import random
 import math
 from config import *
 from base import *
+from plans import *
 
 """
 Message types:
@@ -15,6 +16,8 @@ Message types:
             declaration that a cell is restricted (and should not be entered into/stayed in)
     - "unrestriction": (x,y)
             declaration that a cell is unrestricted (and can be entered into/stayed in)
+    - "help_cancel": (x,y)
+            the matchmaker withdraws its please_help assignment to (x,y)
 
 Partner message types:
     - "facing_direction": Dir
@@ -23,16 +26,18 @@ Partner message types:
             request for partner to move forward
     - "pickup_req": t_sync
     - "pickup_ack": t_sync
-    - "move_sync_req": dict of {t_sync: int, plan: list, confirmed: bool, current_step: int}
+    - "move_sync_req": dict of {t_sync: int, plan: ActionScript, confirmed: bool, current_step: int}
             proposer proposes a coordinated move plan to take the pair from their current position to the deposit *once they are oriented in the same way*
     - "move_sync_ack": Bool
             proposer sends in response to a sync proposal to let partner know plan is acknowledged
 """
 
-message_types = ["please_help", "pairup_req", "pairup_ack", "restriction", "unrestriction"]
+message_types = ["please_help", "pairup_req", "pairup_ack", "restriction", "unrestriction", "help_cancel"]
 partner_message_types = ["facing_direction", "move_forward", "pickup_req", "pickup_ack", "move_sync_req", "move_sync_ack"]
 
 class Message:
+    __slots__ = ("timestep", "mtype", "content", "countdown", "proposer", "acceptor", "owners")
+
     def __init__(self, timestep: int, mtype: str, content: tuple, proposer: 'Robot'=None, acceptor: 'Robot'=None, countdown: int=1):
         self.timestep = timestep    # timestep when message was sent
         self.mtype = mtype          # message type
@@ -40,6 +45,7 @@ class Message:
         self.countdown = countdown  # counts down to when message can be read, e.g. in the next timestep
         self.proposer = proposer    # robot who sent the message
         self.acceptor = acceptor    # robot who accepts the message
+        self.owners = 0             # number of KB lists holding this message (see MessagePool)
     
     def __eq__(self, other):
         if self.mtype == "please_help" or self.mtype == "partnered":
@@ -58,16 +64,80 @@ class Message:
                     self.acceptor == other.acceptor)
     
     def copy(self):
-        return Message(timestep=self.timestep, mtype=self.mtype, content=self.content, proposer=self.proposer, acceptor=self.acceptor, countdown=self.countdown)
+        return message_pool.copy(self)
 
     def decrement_countdown(self):
         if self.countdown > 0:
             self.countdown -= 1
 
+class MessagePool:
+    """Recycles the message copies KBs are done with, so delivering a message stops allocating.
+
+    Every KB list that holds a message counts as one owner (keep, discard and clear below); a
+    message goes back to the pool when its last owner lets go. KB lists can share a message object,
+    since list.remove takes out the first equal message rather than the one read. Released messages
+    are only handed out again after recycle(), called at the end of every timestep, so references
+    held during a step stay valid.
+    """
+
+    def __init__(self):
+        self.free = []
+        self.retired = []
+        self.reused = 0 # copies served from the pool
+
+    def copy(self, message):
+        if self.free:
+            copy = self.free.pop()
+            self.reused += 1
+        else:
+            copy = Message.__new__(Message)
+        copy.timestep = message.timestep
+        copy.mtype = message.mtype
+        copy.content = message.content
+        copy.countdown = message.countdown
+        copy.proposer = message.proposer
+        copy.acceptor = message.acceptor
+        copy.owners = 0
+        return copy
+
+    def release(self, messages):
+        """One owner lets go of each message."""
+        for message in messages:
+            message.owners -= 1
+            if message.owners == 0:
+                self.retired.append(message)
+
+    def recycle(self):
+        self.free.extend(self.retired)
+        self.retired.clear()
+
+message_pool = MessagePool() # shared by every KB
+
+def keep(messages, message):
+    """messages.append(message), with messages as one more owner of message."""
+    messages.append(message)
+    message.owners += 1
+
+def discard(messages, message):
+    """messages.remove(message), releasing the message it removes (the first equal one) to the pool."""
+    for i, other in enumerate(messages):
+        if other is message or other == message:
+            message_pool.release((messages.pop(i),))
+            return
+    raise ValueError("message not in list")
+
+def clear(messages):
+    """Empty a KB message list in place, releasing its messages to the pool."""
+    message_pool.release(messages)
+    messages.clear()
+
 class KB:
     def __init__(self, deposit):
         self.deposit = deposit  # deposit tile
         self.sensed = {}        # {tile: [object(s)]}
+        self.sensed_versions = {} # {tile: tile.version when it was last sensed}
+        self.sensed_order = {}  # {tile: how many tiles had been sensed before it was first sensed}
+        self.known_gold = {}    # {tile: sensed_order[tile]} for the sensed tiles with gold
         
         self.received_messages = {mtype: [] for mtype in message_types}                   # messages received (but not read); {message_type: [Message, ...]}
         self.read_messages = {mtype: [] for mtype in message_types}                       # messages read; {message_type: [Message, ...]}
@@ -75,13 +145,30 @@ class KB:
         self.received_partner_messages = {pmtype: [] for pmtype in partner_message_types} # partner messages received (but not read); {message_type: [Message, ...]}
         self.read_partner_messages = {pmtype: [] for pmtype in partner_message_types}     # partner messages read; {message_type: [Message, ...]}
     
+    def record(self, pos, tile):
+        """Write what is on tile into sensed, keeping known_gold in line."""
+        if pos not in self.sensed_order:
+            self.sensed_order[pos] = len(self.sensed_order)
+        record = self.sensed.get(pos)
+        if record is None:
+            self.sensed[pos] = {"deposit": tile.deposit, "gold": tile.gold, "robots": tile.robots}
+        else: # overwrite in place instead of building a new dict every time the tile changes
+            record["deposit"] = tile.deposit
+            record["gold"] = tile.gold
+            record["robots"] = tile.robots
+        self.sensed_versions[pos] = tile.version
+        if tile.gold > 0:
+            self.known_gold[pos] = self.sensed_order[pos]
+        else:
+            self.known_gold.pop(pos, None)
+
     def receive_message(self, message: Message):
         if message.mtype not in message_types: # partner messages
             if message not in self.received_partner_messages[message.mtype]:
-                self.received_partner_messages[message.mtype].append(message.copy()) # stores a copy, so that countdown can be delayed
+                keep(self.received_partner_messages[message.mtype], message.copy()) # stores a copy, so that countdown can be delayed
         else: # regular messages
             if message not in self.received_messages[message.mtype]:
-                self.received_messages[message.mtype].append(message.copy())
+                keep(self.received_messages[message.mtype], message.copy())
     
     def deliver_messages(self):
         for mtype, messages in self.received_messages.items():
@@ -95,22 +182,43 @@ class KB:
         for mtype, messages in self.received_messages.items():
             for message in messages:
                 if message in self.read_messages[mtype]:
-                    messages.remove(message)
+                    discard(messages, message)
                 elif message.countdown == 0:
-                    self.read_messages[mtype].append(message)
-                    messages.remove(message)
+                    keep(self.read_messages[mtype], message)
+                    discard(messages, message)
                 else:
                     message.decrement_countdown()
         for pmtype, messages in self.received_partner_messages.items():
             for message in messages: 
                 if message in self.read_partner_messages[pmtype]:
-                    messages.remove(message)
+                    discard(messages, message)
                 elif message.countdown == 0:
-                    self.read_partner_messages[pmtype].append(message) # only keep the latest partner message
-                    messages.remove(message)
+                    keep(self.read_partner_messages[pmtype], message) # only keep the latest partner message
+                    discard(messages, message)
                 else:
                     message.decrement_countdown()
 
+    def has_unread(self):
+        """True if any received message is still waiting to be read."""
+        for messages in self.received_messages.values():
+            if messages:
+                return True
+        for messages in self.received_partner_messages.values():
+            if messages:
+                return True
+        return False
+
+    def has_stale(self):
+        """True if clean_help_requests or remove_restrictions would drop a read message."""
+        read = self.read_messages
+        if read["help_cancel"]:
+            return True
+        for restriction in read["restriction"]:
+            for message in read["please_help"] + read["unrestriction"]:
+                if message.content == restriction.content:
+                    return True
+        return False
+
     def clean_help_requests(self):
         if self.read_messages["please_help"]:
             for request in self.read_messages["please_help"]:
@@ -118,19 +226,25 @@ class KB:
                     for restriction in self.read_messages["restriction"]:
                         if request.content == restriction.content: 
                             if request in self.read_messages["please_help"]: # not sure why there's an error about the request NOT being in the messages list; had to add this
-                                self.read_messages["please_help"].remove(request)
+                                discard(self.read_messages["please_help"], request)
+        for cancel in self.read_messages["help_cancel"]: # matchmaker assignments that were withdrawn
+            for request in list(self.read_messages["please_help"]):
+                if request.content == cancel.content and request.proposer == cancel.proposer:
+                    discard(self.read_messages["please_help"], request)
+        clear(self.read_messages["help_cancel"])
 
     def clean_pickup(self):
-        self.read_partner_messages["pickup_req"] = []
-        self.read_partner_messages["pickup_ack"] = []
+        clear(self.read_partner_messages["pickup_req"])
+        clear(self.read_partner_messages["pickup_ack"])
 
     def clean_pairup(self):
-        self.read_messages["pairup_req"] = []
-        self.read_messages["pairup_ack"] = []
+        clear(self.read_messages["pairup_req"])
+        clear(self.read_messages["pairup_ack"])
 
     def clean_partner_messages(self):
-        self.received_partner_messages = {pmtype: [] for pmtype in partner_message_types}
-        self.read_partner_messages = {pmtype: [] for pmtype in partner_message_types} 
+        for pmtype in partner_message_types:
+            clear(self.received_partner_messages[pmtype])
+            clear(self.read_partner_messages[pmtype])
 
     def remove_restrictions(self):
         if len(self.read_messages["unrestriction"]) == 0 or len(self.read_messages["restriction"]) == 0:
@@ -140,9 +254,9 @@ class KB:
                 for r_coords in self.read_messages["restriction"]:
                     if r_coords.content == u_coords.content:
                         if r_coords in self.read_messages["restriction"]: 
-                            self.read_messages["restriction"].remove(r_coords)
+                            discard(self.read_messages["restriction"], r_coords)
                         if u_coords in self.read_messages["unrestriction"]: # in case it was removed before
-                            self.read_messages["unrestriction"].remove(u_coords)
+                            discard(self.read_messages["unrestriction"], u_coords)
 
     def check_restriction(self, coordinates):
         if len(self.read_messages["restriction"]) != 0:
@@ -159,31 +273,48 @@ class Robot:
       self.id = Robot.next_id; Robot.next_id += 1
       self.team = team
       self.pos = position             # [x,y]
+      self.cell = tuple(position)     # (x,y): pos as a tile key, kept in step by move() so it isn't rebuilt on every lookup
       self.dir = direction            # Dir
       self.kb = KB(deposit = deposit) # !!! might have a better way to keep track of this
       self.timestep = timestep        # current timestep
 
+      self._carrying = False
       self.carrying = False       # True if carrying gold
       self.decision = "wait"
-      self.target_position = tuple(self.pos)
+      self.target_position = self.cell
 
       self.partner = None         # the robot it is partnered with
       self.pros_partner = None    # prospective partner
       self.seeking_help = False
       self.offering_help = False
 
-      self.move_sync_pending = None     # {t_sync: int, plan: list, confirmed: bool, current_step: int}
+      self.move_sync_pending = None     # {t_sync: int, plan: ActionScript, confirmed: bool, current_step: int}
       self.move_sync_plan = None        # plan ready to execute
+      self.move_sync_cursor = None      # (run, offset) of the next action in move_sync_plan["plan"]
       self.move_sync_proposed = False
 
       self.pickup_proposed = False      # proposed pickup
       self.pickup_t_sync = None         # int; timestep
 
+      self.awaiting_ack = {}            # {ack mtype: (expected content, timestep the request was sent)}
+      self.rtt = None                   # smoothed partner round trip, in timesteps
+      self.rtt_var = None               # smoothed deviation of the round trip
+
+    @property
+    def carrying(self):
+        return self._carrying
+
+    @carrying.setter
+    def carrying(self, value):
+        self._carrying = value
+        self.grid.update_carrying(self) # keeps the grid's index of carrying robots up to date
+
     ### HELPER FUNCTIONS ###
 
     def next_position(self):
-        new_x = self.pos[0] + DIR_VECT[self.dir][0]
-        new_y = self.pos[1] + DIR_VECT[self.dir][1]
+        dx, dy = DIR_VECT[self.dir]
+        new_x = self.pos[0] + dx
+        new_y = self.pos[1] + dy
         if new_x < 0 or new_x >= GRID_SIZE or new_y < 0 or new_y >= GRID_SIZE:
             return self.pos
         return (new_x, new_y)
@@ -192,38 +323,37 @@ class Robot:
         return round(math.sqrt((a[0]-b[0])**2 + (a[1]-b[1])**2), 2)
 
     def closest_gold(self):
-        gold_positions = [pos for pos, info in self.kb.sensed.items() if info.get("gold", 0) > 0]
-        if gold_positions == []:
+        known_gold = self.kb.known_gold # only the tiles with gold, not everything sensed
+        if not known_gold:
             return None
-        
-        closest_gold_pos = min(gold_positions, key=lambda pos: self.calc_dist(tuple(self.pos), pos))
+        here = self.cell
+        closest_gold_pos = min(known_gold, key=lambda pos: (self.calc_dist(here, pos), known_gold[pos])) # ties go to the tile sensed first
         return closest_gold_pos
 
     def calc_target_dir(self):
         target_position = self.target_position
-        dx = target_position[0] - self.pos[0]
-        dy = target_position[1] - self.pos[1]
-
-        if abs(dx) > abs(dy):
-            target_dir = Dir.EAST if dx > 0 else Dir.WEST
-        else:
-            target_dir = Dir.SOUTH if dy > 0 else Dir.NORTH
-        
-        return target_dir
+        pos = self.pos
+        return target_dir(target_position[0] - pos[0], target_position[1] - pos[1])
 
     def reset_partner(self):
+        if self.grid.spans:
+            self.grid.spans.end_all(self, self.timestep, "failed")
         self.partner = None
         self.pros_partner = None
         self.seeking_help = False
         self.offering_help = False
         self.move_sync_pending = None
         self.move_sync_plan = None
+        self.move_sync_cursor = None
         self.move_sync_proposed = False
+        self.awaiting_ack.clear()
         return
     
-    def reset_pickup(self):
+    def reset_pickup(self, outcome="failed"):
+        self.span("pickup", outcome)
         self.pickup_t_sync = None
         self.pickup_proposed = False
+        self.awaiting_ack.pop("pickup_ack", None) # a timeout is not a round trip sample
         self.clean_pickup()
         return
     
@@ -231,60 +361,49 @@ class Robot:
 
     def sense(self): # !!! not really working!!!!! is it working now??? 
         """Sense the surrounding tiles and update KB."""
-        tile = self.grid.tiles[tuple(self.pos)]
-        self.kb.sensed[tuple(self.pos)] = {"deposit": tile.deposit, "gold": tile.gold, "robots": tile.robots}
-        
+        x, y = self.pos
+        self.sense_tile((x, y))
 
         for dx,dy in SENSE_VECT[self.dir]:
-            tile = self.grid.tiles[(self.pos[0]+dx, self.pos[1]+dy)] if (self.pos[0]+dx, self.pos[1]+dy) in self.grid.tiles else None
-            if tile: #and (self.pos[0]+dx, self.pos[1]+dy) not in self.kb.sensed: commented out so it writes over old info
-                objects = {}
-                objects["deposit"] = tile.deposit 
-                objects["gold"] = tile.gold
-                objects["robots"] = tile.robots
-                self.kb.sensed[(self.pos[0]+dx, self.pos[1]+dy)] = objects
+            self.sense_tile((x+dx, y+dy))
+
+    def sense_tile(self, pos):
+        """Write what is on the tile at pos into the KB, unless the KB already has its current version."""
+        tile = self.grid.tiles.get(pos)
+        if tile and self.kb.sensed_versions.get(pos) != tile.version: # writes over old info
+            self.kb.record(pos, tile)
 
 
     def sense_current_tile(self): # sense_tile_values(self):
-        robots = self.kb.sensed.get(tuple(self.pos)).get("robots", [])
+        record = self.kb.sensed[self.cell] # sense() always records the robot's own tile
+        robots = record["robots"]
         teammates = [robot for robot in robots if (robot != self and robot.team == self.team)]
-        gold = self.kb.sensed.get(tuple(self.pos)).get("gold", 0)
+        gold = record["gold"]
 
         return (robots, teammates, gold)
 
     def turn(self, turn_dir): # turn cw or ccw
-        dir_order = [Dir.NORTH, Dir.EAST, Dir.SOUTH, Dir.WEST]
-        curr_index = dir_order.index(self.dir)
-
         if turn_dir == "cw":
-            self.dir = dir_order[(curr_index + 1) % 4]
+            self.dir = DIR_ORDER[CW_CODE[self.dir.value]]
         elif turn_dir == "ccw":
-            self.dir = dir_order[(curr_index - 1) % 4]
+            self.dir = DIR_ORDER[CCW_CODE[self.dir.value]]
         else:
             raise ValueError("Not a valid turn direction!")
 
     def turn_toward(self, target_direction):
-        if self.dir == target_direction:
-            return "wait"
-        
-        # if not facing the right direction, TURN!!!
-        dir_order = [Dir.NORTH, Dir.EAST, Dir.SOUTH, Dir.WEST]
-        curr_index = dir_order.index(self.dir) # index of current direction
-        cw_dir = dir_order[(curr_index + 1) % 4]
-        ccw_dir  = dir_order[(curr_index - 1) % 4]
-
-        if target_direction == ccw_dir:
-            return "turn_ccw"
-        else:
-            return "turn_cw"
+        return TURN_TOWARD_CODE[self.dir.value][target_direction.value]
 
     def move(self):
         """Move forward in the direction it's facing."""
         new_x, new_y = self.next_position()
         if 0 <= new_x < GRID_SIZE and 0 <= new_y < GRID_SIZE:
-            self.grid.tiles[tuple(self.pos)].remove_robot(self)
+            self.grid.tiles[self.cell].remove_robot(self)
+            moved = self.pos != [new_x, new_y]
             self.pos = [new_x, new_y]
-            self.grid.tiles[tuple(self.pos)].add_robot(self)
+            self.cell = (new_x, new_y)
+            self.grid.tiles[self.cell].add_robot(self)
+            if self.grid.heatmaps and moved:
+                self.grid.heatmaps.visit(self.pos)
         else:
             pass
 
@@ -300,6 +419,7 @@ class Robot:
             if self.kb.read_messages["pairup_ack"]:
                 partner = self.kb.read_messages["pairup_ack"][-1].proposer # only a single request would've been sent out
                 self.partner = partner
+                self.span("pairup", "ok")
                 self.send_restriction() # restrict the tile
                 self.clean_pairup()
                 print(ANSI.YELLOW.value + f"Robot {self.id} successfully partnered with Robot {self.partner.id}" + ANSI.RESET.value)
@@ -311,10 +431,11 @@ class Robot:
         # not offering help
         if self.kb.read_messages["please_help"]: # to prevent two robots seeking for help at the same time (with delayed messages)
             for request in self.kb.read_messages["please_help"]:
-                if request.content == tuple(self.pos) and request.proposer in tileteammates: # about to respond to a help request
+                if request.content == self.cell and request.proposer in tileteammates: # about to respond to a help request
                     self.pros_partner = request.proposer
                     self.send_pairup_request(self.pros_partner)
                     self.offering_help = True
+                    self.span("pairup")
                     print(ANSI.MAGENTA.value + f"Robot {self.id} sent pairup request to {self.pros_partner.id}" + ANSI.RESET.value)
                     return
 
@@ -323,6 +444,7 @@ class Robot:
             if self.kb.read_messages["pairup_req"]:
                 partner = self.kb.read_messages["pairup_req"][-1].proposer
                 self.partner = partner
+                self.span("pairup", "ok")
                 self.send_pairup_acknowledgement(partner)
                 self.clean_pairup()
                 print(ANSI.YELLOW.value + f"Robot {self.id} successfully partnered with Robot {self.partner.id}" + ANSI.RESET.value)
@@ -335,17 +457,19 @@ class Robot:
             tileteammates.sort(key=lambda x: x.id)
             if self.id < tileteammates[0].id: # lowest ID becomes help seeker
                 self.seeking_help = True 
+                self.span("pairup")
                 print(ANSI.MAGENTA.value + f"Robot {self.id} waiting for a pairup request" + ANSI.RESET.value)
                 return
             else:
                 self.pros_partner = tileteammates[0]
                 self.send_pairup_request(tileteammates[0])
                 self.offering_help = True
+                self.span("pairup")
                 print(ANSI.MAGENTA.value + f"Robot {self.id} sent pairup request to {self.pros_partner.id}" + ANSI.RESET.value)
                 return
 
     def pickup_gold(self):
-        tile = self.grid.tiles[tuple(self.pos)]
+        tile = self.grid.tiles[self.cell]
         tile_robots, tile_teammates, tile_gold = self.sense_current_tile()
 
         if len(tile_teammates) > 1:
@@ -378,8 +502,8 @@ class Robot:
 
         if self.timestep == self.pickup_t_sync: # successful pickup
             self.carrying = True
-            tile.remove_gold()
-            self.reset_pickup()
+            self.grid.remove_gold(self.cell)
+            self.reset_pickup("ok")
             print(ANSI.YELLOW.value + f"Robot {self.id} successfully picked up gold at {self.pos}!" + ANSI.RESET.value)
             self.send_unrestriction()
             return
@@ -388,10 +512,11 @@ class Robot:
             print(ANSI.RED.value + f"Robot {self.id} failed to pick up gold at {self.pos}!" + ANSI.RESET.value)
 
     def plan_pickup(self):
+        self.span("pickup")
         if self.pickup_t_sync:
             if self.pickup_t_sync <= self.timestep:
                 print(ANSI.RED.value + f"Robot {self.id} can't fulfil pickup at timestep {self.pickup_t_sync}!" + ANSI.RESET.value)
-                self.reset_pickup()
+                self.reset_pickup("expired")
                 return
             else:
                 print(ANSI.MAGENTA.value + f"Robot {self.id} waiting to pickup gold at timestep {self.pickup_t_sync}!" + ANSI.RESET.value)
@@ -405,11 +530,12 @@ class Robot:
                     return
                 else:
                     print(ANSI.MAGENTA.value + f"Robot {self.id} can't fulfil pickup at timestep {self.pickup_t_sync}!" + ANSI.RESET.value)
-                    self.reset_pickup()
+                    self.reset_pickup("expired")
                     return
             elif self.pickup_proposed == False: # no acknowledgement of a pickup request from partner; pickup request not proposed
-                t_sync = self.timestep + 10
+                t_sync = self.timestep + self.sync_delay(PICKUP_DELAY)
                 self.send_pickup_request(t_sync)
+                self.awaiting_ack["pickup_ack"] = (t_sync, self.timestep)
                 self.pickup_proposed = True
                 print(ANSI.MAGENTA.value + f"Robot {self.id} proposed a pickup request!" + ANSI.RESET.value)
                 return
@@ -426,7 +552,7 @@ class Robot:
                     return
                 else:
                     print(ANSI.MAGENTA.value + f"Robot {self.id} can't fulfil pickup at timestep {self.pickup_t_sync}!" + ANSI.RESET.value)
-                    self.reset_pickup()
+                    self.reset_pickup("expired")
                     return
             else:
                 print(ANSI.MAGENTA.value + f"Robot {self.id} waiting for a pickup request!" + ANSI.RESET.value)
@@ -455,11 +581,14 @@ class Robot:
 
         if help_requests: # RESPOND to help requests
             help_message = help_requests[0]
-            if self.calc_dist(self.pos, help_message.content) < 5: # distance threshold
+            if self.calc_dist(self.pos, help_message.content) < HELP_RADIUS: # distance threshold
                 self.target_position = tuple(help_message.content)
     
-        if self.closest_gold(): # GO TO NEAREST GOLD
-            self.target_position = tuple(self.closest_gold())
+        closest_gold = self.closest_gold()
+        if self.grid.matchmaker and help_requests: # GO TO THE ASSIGNED HELP REQUEST (targeted by the matchmaker, so no distance threshold)
+            self.target_position = tuple(help_requests[-1].content)
+        elif closest_gold: # GO TO NEAREST GOLD
+            self.target_position = tuple(closest_gold)
         else:  # RUN AROUND
             self.target_position = self.next_position()
             if self.target_position == self.pos:
@@ -484,7 +613,9 @@ class Robot:
 
         if self.decision == "move_forward" and self.check_restriction(self.next_position()):
             print(ANSI.CYAN.value + f"Robot {self.id} at {self.pos} recognizes it can't enter cell {self.next_position()}" + ANSI.RESET.value)
-            self.decision = ["wait", tuple(self.pos)] # overrides decision
+            self.decision = "wait" # overrides decision
+            if self.grid.heatmaps:
+                self.grid.heatmaps.restriction_wait(self.next_position())
         
         return
     
@@ -536,7 +667,9 @@ class Robot:
                 # if a plan is already confirmed, go for it
                 elif self.move_sync_pending["confirmed"] and self.timestep == self.move_sync_pending["t_sync"]:
                     self.move_sync_plan = self.move_sync_pending
+                    self.move_sync_cursor = (0, 0)
                     self.move_sync_pending = None
+                    self.span("move_sync", "ok")
                     print(ANSI.MAGENTA.value + f"Robot {self.id}: activating sync plan at timestep {self.timestep}" + ANSI.RESET.value)
             
         # if already executing a synced plan, check the plan for what to do
@@ -544,12 +677,13 @@ class Robot:
             plan = self.move_sync_plan
             step_index = plan["current_step"]
             planned_step_timestep = plan["t_sync"] + step_index
-            move = plan["plan"][step_index]
+            script = plan["plan"]
+            move = script.action(self.move_sync_cursor[0])
             print(f"robot: {self.id} current timestep: {self.timestep}, planned_step_timestep:{planned_step_timestep}, move: {move}")
             if self.timestep == planned_step_timestep:
-                # move = plan["plan"][step_index]
                 self.decision = move
                 plan["current_step"] += 1
+                self.move_sync_cursor = script.advance(*self.move_sync_cursor)
                 return
             else:
                 self.decision = "wait"
@@ -572,16 +706,23 @@ class Robot:
     def receive_message(self, message: Message):
         """Receive a message and store it in the KB."""
         self.kb.receive_message(message)
+        if self.grid.scheduler:
+            self.grid.scheduler.wake(self)
     
     def read_message(self):
         """Read received messages in the KB."""
         self.kb.read_message()
+        if self.awaiting_ack:
+            self.observe_latency()
 
     def send_message(self, message: Message, acceptor: 'Robot'):
         """Send a message to a robot."""
         message.proposer = self
         message.acceptor = acceptor
-        message.countdown = random.randint(1,3)
+        if self.grid.network: # asynchronous runtime: the network delays the message instead of its countdown
+            self.grid.network.send(message, acceptor)
+            return
+        message.countdown = random.randint(*MESSAGE_DELAY)
         acceptor.receive_message(message)
 
     def send_to_all(self, message: Message):
@@ -602,27 +743,34 @@ class Robot:
 
     def send_pairup_request(self, acceptor: 'Robot'):
         """Send a pairup request to the acceptor robot."""
-        message = Message(timestep=self.timestep, mtype="pairup_req", content=tuple(self.pos)) # content is the position, but we only need to check for proposer/acceptor
+        message = Message(timestep=self.timestep, mtype="pairup_req", content=self.cell) # content is the position, but we only need to check for proposer/acceptor
         self.send_message(message, acceptor)
 
     def send_pairup_acknowledgement(self, acceptor: 'Robot'):
         """Send a pairup acknowledgement to the acceptor robot."""
-        message = Message(timestep=self.timestep, mtype="pairup_ack", content=tuple(self.pos)) # content is the position, but we only need to check for proposer/acceptor
+        message = Message(timestep=self.timestep, mtype="pairup_ack", content=self.cell) # content is the position, but we only need to check for proposer/acceptor
         self.send_message(message, acceptor)
     
     def send_restriction(self):
         """Send a message to all that a cell is restricted"""
-        message = Message(timestep=self.timestep, mtype="restriction", content=tuple(self.pos))
+        message = Message(timestep=self.timestep, mtype="restriction", content=self.cell)
         self.send_to_all(message)
+        if self.grid.heatmaps:
+            self.grid.heatmaps.restrict(self.pos, self.timestep)
 
     def send_unrestriction(self):
         """Send a message to all that a cell is unrestricted"""
-        message = Message(timestep=self.timestep, mtype="unrestriction", content=tuple(self.pos))
+        message = Message(timestep=self.timestep, mtype="unrestriction", content=self.cell)
         self.send_to_all(message)
+        if self.grid.heatmaps:
+            self.grid.heatmaps.unrestrict(self.pos, self.timestep)
     
     def send_help_request(self):
-        """Send a please_help message to all robots."""
-        message = Message(timestep=self.timestep, mtype="please_help", content=tuple(self.pos))
+        """Send a please_help message to all robots (or register the request with the matchmaker)."""
+        if self.grid.matchmaker:
+            self.grid.matchmaker.request(self)
+            return
+        message = Message(timestep=self.timestep, mtype="please_help", content=self.cell)
         self.send_to_all(message)
     
     def send_pickup_request(self, t_sync):
@@ -642,86 +790,17 @@ class Robot:
     
     def send_move_request(self):
         """Send a move_forward message to partner."""
-        message = Message(timestep=self.timestep, mtype="move_forward", content=tuple(self.pos))
+        message = Message(timestep=self.timestep, mtype="move_forward", content=self.cell)
         self.send_to_partner(message)
 
     def calculate_moves_to_deposit(self):
-        #function that returns a list of actions taking robots from current position to deposit
-
-        #need to make a copy of these functions in here cause I don't want to edit the ones outside and break our code
-        #since the ones outside take in the robot object itself
-
-        def copy_calc_target_dir(from_pos,to_pos):
-            fx,fy = from_pos
-            tx,ty = to_pos
-            dx = tx-fx
-            dy = ty-fy
-
-            if dx != 0:
-                return Dir.EAST if dx > 0 else Dir.WEST
-            elif dy != 0:
-                return Dir.SOUTH if dy > 0 else Dir.NORTH
-            else:
-                return None
-        
-        def copy_turn_toward(curr_dir, target_dir):
-            dir_order = [Dir.NORTH, Dir.EAST, Dir.SOUTH, Dir.WEST]
-            curr_index = dir_order.index(curr_dir)
-            cw_dir = dir_order[(curr_index + 1)%4]
-            ccw_dir = dir_order[(curr_index - 1)%4]
-
-            if target_dir == curr_dir:
-                return "wait"
-            elif target_dir == cw_dir:
-                return "turn_cw"
-            elif target_dir == ccw_dir:
-                return "turn_ccw"
-            else:
-                return "turn_cw" 
-        
-        def copy_move_forward(pos,dir): #use to perform moves forward so next move can be calculated
-            x,y = pos
-            if dir == Dir.NORTH and y>0:
-                y -= 1
-            elif dir == Dir.SOUTH and y < GRID_SIZE - 1:
-                y += 1
-            elif dir == Dir.EAST and x < GRID_SIZE - 1:
-                return (x + 1, y)
-            elif dir == Dir.WEST and x > 0:
-                return (x - 1, y)
-            return (x,y)
-        
-        #loop to simulate all the moves
-        pos = self.pos
-        dir = self.dir
-        target = self.kb.deposit
-        moves = []
-
-        #fix the movement so it moves all the way in x direction first then in y direction
-        for axis in [0,1]: #0 is x, 1 is y
-            while pos[axis] != target[axis]:
-                if axis ==0:
-                    target_dir = Dir.EAST if target[0] > pos[0] else Dir.WEST
-                else:
-                    target_dir = Dir.SOUTH if target[1] > pos[1] else Dir.NORTH
-                
-                if dir != target_dir:
-                    move = copy_turn_toward(dir, target_dir)
-                    moves.append(move)
-                
-                    dirs = [Dir.NORTH, Dir.EAST, Dir.SOUTH, Dir.WEST]
-                    dir = dirs[(dirs.index(dir) + (1 if move=="turn_cw" else -1)) % 4]
-                else:
-                    moves.append("move_forward")
-                    pos = copy_move_forward(pos, dir)
-        moves.append("deposit_gold")
-
-        return moves
+        """ActionScript of the moves from the current position to the deposit (see plans.py)."""
+        return moves_to_deposit(self.cell, self.dir, tuple(self.kb.deposit))
 
     def propose_sync_plan(self,timestep):
         # propose move with partner including all timstep actions
-        plan_delay = 10 # how many timesteps into the future the robots plan to move together
-        # can change plan delay later, maybe see if larger/smaller values would work better
+        plan_delay = self.sync_delay(PLAN_DELAY) # how many timesteps into the future the robots plan to move together
+        # can change plan delay later (config.py), maybe see if larger/smaller values would work better
         # 10 seems to be a pretty decent value so far
 
         if not self.partner:
@@ -736,12 +815,14 @@ class Robot:
         content=(t_sync, plan),
         proposer=self,
         acceptor=self.partner,
-        countdown=random.randint(1, 3) #set a random delay AHHHH
+        countdown=random.randint(*MESSAGE_DELAY) #set a random delay AHHHH
         )
 
         self.send_to_partner(sync_message)
         self.move_sync_pending = {"t_sync": t_sync, "plan": plan, "confirmed": False, "current_step": 0}
         self.move_sync_proposed = True
+        self.awaiting_ack["move_sync_ack"] = ((t_sync,), timestep)
+        self.span("move_sync")
         print(f"Robot {self.id}: proposed sync plan for timestep {t_sync}: {plan}")
 
     def handle_sync_messages(self,timestep):
@@ -752,6 +833,9 @@ class Robot:
             latest = msgs["move_sync_req"][-1]
             t_sync, plan = latest.content
             proposer = latest.proposer
+            known = any(plan and plan["t_sync"] == t_sync for plan in (self.move_sync_pending, self.move_sync_plan)) # read messages stay around
+            if not known:
+                self.span("move_sync")
 
             if timestep < t_sync:
 
@@ -761,7 +845,7 @@ class Robot:
                     content=(t_sync,),
                     proposer=self,
                     acceptor=proposer,
-                    countdown=random.randint(1, 3)
+                    countdown=random.randint(*MESSAGE_DELAY)
                 )
 
                 self.send_to_partner(ack)
@@ -770,6 +854,8 @@ class Robot:
             
             else:
                 print(f"Robot {self.id}: rejected expired plan proposed at (t={t_sync}, now={timestep})")
+                if not known:
+                    self.span("move_sync", "expired")
         
         # responding to partner acknowledgement
         if msgs["move_sync_ack"]:
@@ -782,6 +868,8 @@ class Robot:
                     print(f"Robot {self.id}: sync plan confirmed for timestep {t_sync}")
                 else:
                     print(f"Robot {self.id}: recieved late ack for t={t_sync}, ignoring")
+                    if not self.move_sync_pending["confirmed"]:
+                        self.span("move_sync", "expired")
 
     def check_restriction(self, coordinates):
         return self.kb.check_restriction(coordinates)
@@ -798,6 +886,89 @@ class Robot:
             if len(robots) == 1 and robots[0].id != self.id: #make sure that the robot there is not itself, pretty sure this is legal
                 return True
 
+    ### LATENCY ###
+
+    def observe_latency(self):
+        """Take a round trip sample for every awaited handshake whose acknowledgement has been read."""
+        for mtype, (content, sent) in list(self.awaiting_ack.items()):
+            acks = self.kb.read_partner_messages[mtype]
+            if acks and acks[-1].content == content:
+                del self.awaiting_ack[mtype]
+                self.observe_rtt(self.timestep - sent)
+
+    def observe_rtt(self, sample):
+        if self.rtt is None:
+            self.rtt, self.rtt_var = sample, sample / 2
+        else: # same smoothing as TCP's retransmission timer (RFC 6298)
+            self.rtt_var = 0.75 * self.rtt_var + 0.25 * abs(self.rtt - sample)
+            self.rtt = 0.875 * self.rtt + 0.125 * sample
+
+    def sync_delay(self, default):
+        """How many timesteps ahead to schedule a handshake: a retransmission-timeout style bound on the round trip plus a margin, or default without history."""
+        if not ADAPTIVE_SYNC or self.rtt is None:
+            return default
+        return math.ceil(self.rtt + SYNC_DEVIATIONS * self.rtt_var) + SYNC_MARGIN
+
+    ### ANALYTICS ###
+
+    def span(self, kind, outcome=None):
+        """Start (no outcome) or end a handshake span, when the grid records them (see spans.py)."""
+        spans = self.grid.spans
+        if spans:
+            if outcome is None:
+                spans.start(kind, self, self.timestep)
+            else:
+                spans.end(kind, self, self.timestep, outcome)
+
+    ### SCHEDULING ###
+
+    def wake(self):
+        self.grid.scheduler.wake(self)
+
+    def idle_until(self):
+        """(deadline, tile) to sleep until if the next timesteps would change nothing, otherwise None.
+
+        Covers waiting for the pickup timestep and for a pickup or pairup reply. A robot with unread
+        or stale messages or carrying gold never sleeps, nor does one seeking help (it resends its
+        request every timestep).
+        """
+        if self.carrying or self.kb.has_unread() or self.kb.has_stale():
+            return None
+        pos = self.cell
+        tile = self.grid.tiles[pos]
+        if tile.gold == 0:
+            return None
+
+        if self.partner:
+            if self.decision != "plan_pickup":
+                return None
+            if self.pickup_t_sync:
+                if self.pickup_t_sync > self.timestep + 1:
+                    return (self.pickup_t_sync, pos) # plan() switches to pickup_gold at t_sync
+                return None
+            if self.id < self.partner.id:
+                if self.pickup_proposed and not self.kb.read_partner_messages["pickup_ack"]:
+                    return (None, pos)
+            elif not self.kb.read_partner_messages["pickup_req"]:
+                return (None, pos)
+            return None
+
+        if self.check_restriction(pos):
+            return None
+        teammates = [robot for robot in tile.robots if (robot != self and robot.team == self.team)]
+        if self.decision == "pair_up" and teammates:
+            if self.offering_help:
+                if not self.kb.read_messages["pairup_ack"]:
+                    return (None, pos)
+                return None
+            for request in self.kb.read_messages["please_help"]:
+                if request.content == pos and request.proposer in teammates:
+                    return None
+            if self.seeking_help and not self.kb.read_messages["pairup_req"]:
+                return (None, pos)
+            return None
+        return None
+
 ###__________________________________________________________________________###
 
     def plan(self, timestep):
@@ -813,39 +984,40 @@ class Robot:
                 if tilegold > 0: # PICKUP GOLD if has partner and not carrying
                     if timestep == self.pickup_t_sync:
                         self.decision = "pickup_gold"
-                        self.target_position = tuple(self.pos)
+                        self.target_position = self.cell
                     else:
                         self.decision = "plan_pickup"
-                        self.target_position = tuple(self.pos)
+                        self.target_position = self.cell
                     return
                 else: # UNPAIR if gold ~mysteriously~ disappears
                     self.reset_partner()
                     self.decision = "wait"
-                    self.target_position = tuple(self.pos)
+                    self.target_position = self.cell
                     return
         else:
             if len(self.kb.read_messages["restriction"]) != 0:
                 for message in self.kb.read_messages.get("restriction"):
-                    if tuple(self.pos) == message.content: # LEAVE if on restricted tile
+                    if self.cell == message.content: # LEAVE if on restricted tile
                         self.set_target() # sets decision and target position
                         return
             if tilegold > 0:
                 if len(tileteammates) > 0: # PAIR UP if has teammates
                     self.decision = "pair_up"
-                    self.target_position = tuple(self.pos)
+                    self.target_position = self.cell
                     print(ANSI.MAGENTA.value + f"Robot {self.id} is attempting to pair up" + ANSI.RESET.value)
                     return
                 else: # SEND HELP REQUEST if no other teammates AND robot does not "see" already on the tile
                     if not self.check_teammate_there(): #no teammate seen by the robot at the tile, check function returns true if there is a robot
                         self.decision = "wait"
-                        self.target_position = tuple(self.pos)
+                        self.target_position = self.cell
                         self.send_help_request()
                         self.seeking_help = True
+                        self.span("pairup")
                         print(ANSI.CYAN.value + f"Robot {self.id} at {self.pos} is sending help request" + ANSI.RESET.value)
                         return
                     else: #teammate seen by the robot at the tile, but robot has not recieved a help request from the other robot
                         self.decision = "wait"
-                        self.target_position = tuple(self.pos)
+                        self.target_position = self.cell
                         self.seeking_help = False
                         print(ANSI.CYAN.value + f"Robot {self.id} at {self.pos} sensed a teammate on the tile and will not send a help request" + ANSI.RESET.value)
                         return
@@ -856,10 +1028,7 @@ class Robot:
                 print(ANSI.CYAN.value + f"Robot {self.id} at {self.pos} is exploring" + ANSI.RESET.value)
                 return
 
-    def execute(self, timestep):
-        tile = self.grid.tiles[tuple(self.pos)]
-        tilerobots, tileteammates, tilegold = self.sense_current_tile()
-
+    def print_status(self):
         if self.partner:
             print(ANSI.GREEN.value + 
                 f"robot: {self.id}, partner: {self.partner.id}, target: {self.target_position}, decision: {self.decision}, position: {self.pos}, team_deposit: {self.kb.deposit}" +
@@ -869,6 +1038,11 @@ class Robot:
                 f"robot: {self.id}, partner: None, target: {self.target_position}, decision: {self.decision}, position: {self.pos}, team_deposit: {self.kb.deposit}" +
                 ANSI.RESET.value)
 
+    def execute(self, timestep):
+        tile = self.grid.tiles[self.cell]
+        tilerobots, tileteammates, tilegold = self.sense_current_tile()
+        self.print_status()
+
         if self.decision == "move_forward":
             self.move()
             self.sense()
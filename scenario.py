@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import hashlib
+import numpy as np
+
+from config import *
+
+"""
+Scenarios: where the gold lies and where the robots start, generated with array operations and
+cached as .npz files, so benchmarks load a big map instead of regenerating it.
+
+    scenario = load_scenario({"gold": "clustered", "golds": 5000, "clusters": 40, "spread": 3.0, "seed": 1})
+    sim = Simulation(scenario=scenario)
+
+    python scenario.py '{"gold": "piles", "piles": 100, "pile_size": [1, 5], "seed": 2}'
+
+Recipe keys (missing ones take the defaults below):
+    gold:     "uniform" (golds single nuggets, like Grid does), "clustered" (golds nuggets around
+              clusters random centres, normally spread) or "piles" (piles tiles holding pile_size
+              nuggets each; an int or an inclusive [low, high] range)
+    layout:   spawn layout, a key of LAYOUTS
+    robots:   robots per team
+    seed:     seed of the scenario's own random generator (the global random stream is untouched)
+"""
+
+DEPOSITS = {Team.RED: (0, 0), Team.BLUE: (-1, -1)} # negative coordinates count from the far edge
+
+# Spawn layouts: the first robot of each team starts at "start", each next one "step" further on
+LAYOUTS = {
+    "horizontal": { # Simulation.initialize_robots_horizontal
+        Team.RED: {"start": (1, 0), "step": (1, 0), "dir": Dir.SOUTH},
+        Team.BLUE: {"start": (-2, -1), "step": (-1, 0), "dir": Dir.NORTH},
+    },
+    "vertical": { # Simulation.initialize_robots_vertical
+        Team.RED: {"start": (0, 1), "step": (0, 1), "dir": Dir.EAST},
+        Team.BLUE: {"start": (-1, -2), "step": (0, -1), "dir": Dir.WEST},
+    },
+    "diagonal": {
+        Team.RED: {"start": (1, 1), "step": (1, 1), "dir": Dir.SOUTH},
+        Team.BLUE: {"start": (-2, -2), "step": (-1, -1), "dir": Dir.NORTH},
+    },
+}
+
+DEFAULTS = {"gold": "uniform", "golds": GOLDS, "clusters": 10, "spread": 2.0, "piles": GOLDS, "pile_size": 1, "layout": "horizontal", "robots": ROBOTS_PER_TEAM, "seed": 0}
+MAX_REDRAWS = 100 # rounds of redrawing the clustered nuggets that land on a deposit
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios")
+
+def absolute(pos, size):
+    return (pos[0] % size, pos[1] % size)
+
+class Scenario:
+    """Gold counts per tile ([x,y] array) and robot spawns [(team, (x,y), dir)] for a size x size grid."""
+
+    def __init__(self, gold, spawns, size):
+        self.gold = gold
+        self.spawns = spawns
+        self.size = size
+
+    def deposits(self):
+        return {team: absolute(pos, self.size) for team, pos in DEPOSITS.items()}
+
+    def save(self, path):
+        spawns = np.array([(team.value, x, y, direction.value) for team, (x, y), direction in self.spawns], dtype=np.int32).reshape(-1, 4)
+        np.savez_compressed(path, gold=self.gold, spawns=spawns)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            gold = data["gold"]
+            spawns = [(Team(team), (x, y), Dir(direction)) for team, x, y, direction in data["spawns"].tolist()]
+        return cls(gold, spawns, gold.shape[0])
+
+def place_gold(recipe, size, rng):
+    """[x,y] array of gold counts for the recipe; deposits stay empty."""
+    blocked = np.zeros(size * size, dtype=bool)
+    for pos in DEPOSITS.values():
+        x, y = absolute(pos, size)
+        blocked[x * size + y] = True
+    free = np.flatnonzero(~blocked)
+
+    kind = recipe["gold"]
+    if kind == "uniform":
+        cells = rng.choice(free, size=recipe["golds"])
+        counts = np.bincount(cells, minlength=size * size)
+    elif kind == "clustered":
+        centres = np.stack(np.divmod(rng.choice(free, size=recipe["clusters"]), size), axis=1) # never on a deposit
+        cells = np.zeros(0, dtype=np.int64)
+        for _ in range(MAX_REDRAWS): # redraw the nuggets that land on a deposit
+            n = recipe["golds"] - len(cells)
+            if n <= 0:
+                break
+            points = centres[rng.integers(0, len(centres), size=n)] + rng.normal(0, recipe["spread"], size=(n, 2))
+            points = np.clip(np.rint(points), 0, size - 1).astype(np.int64)
+            drawn = points[:, 0] * size + points[:, 1]
+            cells = np.concatenate([cells, drawn[~blocked[drawn]]])
+        if len(cells) < recipe["golds"]:
+            raise ValueError(f"Could not place {recipe['golds']} clustered gold off the deposits in {MAX_REDRAWS} draws")
+        counts = np.bincount(cells, minlength=size * size)
+    elif kind == "piles":
+        cells = rng.choice(free, size=min(recipe["piles"], len(free)), replace=False)
+        pile_size = recipe["pile_size"]
+        low, high = (pile_size, pile_size) if isinstance(pile_size, int) else pile_size
+        counts = np.zeros(size * size, dtype=np.int64)
+        counts[cells] = rng.integers(low, high + 1, size=len(cells))
+    else:
+        raise ValueError(f"Unknown gold distribution: {kind}")
+    return counts.reshape(size, size).astype(np.int32)
+
+def spawn_robots(layout, robots, size):
+    """[(team, (x,y), dir)] in the order the robots are added: red then blue, robot by robot."""
+    spawns = []
+    for i in range(robots):
+        for team in [Team.RED, Team.BLUE]:
+            spec = LAYOUTS[layout][team]
+            x, y = absolute(spec["start"], size)
+            spawns.append((team, (x + i * spec["step"][0], y + i * spec["step"][1]), spec["dir"]))
+    for team, (x, y), direction in spawns:
+        if not (0 <= x < size and 0 <= y < size):
+            raise ValueError(f"Layout {layout} does not fit {robots} robots per team on a {size}x{size} grid")
+    return spawns
+
+def generate(recipe: dict, size: int = GRID_SIZE):
+    recipe = {**DEFAULTS, **recipe}
+    rng = np.random.default_rng(recipe["seed"])
+    return Scenario(place_gold(recipe, size, rng), spawn_robots(recipe["layout"], recipe["robots"], size), size)
+
+def load_scenario(recipe: dict, size: int = GRID_SIZE, cache_dir: str = CACHE_DIR):
+    """The scenario for recipe, from the cache if it was generated before."""
+    recipe = {**DEFAULTS, **recipe, "size": size}
+    key = hashlib.sha1(json.dumps(recipe, sort_keys=True).encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"{recipe['gold']}_{size}_{key}.npz")
+    if os.path.exists(path):
+        return Scenario.load(path)
+    scenario = generate(recipe, size)
+    os.makedirs(cache_dir, exist_ok=True)
+    scenario.save(path)
+    return scenario
+
+if __name__ == "__main__":
+    import time
+    from base import Grid
+
+    recipe = json.loads(sys.argv[1]) if len(sys.argv) > 1 else {}
+    start = time.perf_counter()
+    scenario = load_scenario(recipe)
+    loaded = time.perf_counter()
+    Grid(scenario)
+    built = time.perf_counter()
+    Grid(scenario, sparse=True)
+    print(f"{scenario.size}x{scenario.size}: {int(scenario.gold.sum())} gold on {int((scenario.gold > 0).sum())} tiles, {len(scenario.spawns)} robots")
+    print(f"loaded in {loaded - start:.3f}s, Grid built in {built - loaded:.3f}s (sparse: {time.perf_counter() - built:.3f}s)")
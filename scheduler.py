@@ -0,0 +1,80 @@
+import heapq
+from config import *
+from direction import *
+
+class Scheduler:
+    """Keeps idle robots asleep until something they wait for happens.
+
+    A robot sleeps until one of: a message reaches it, a timestep deadline comes up, or a tile it
+    watches changes: its own tile (gold or robots) or any other tile it senses. Sleeping robots are
+    skipped by every phase of Simulation.step(), checked as each robot's turn comes, so a robot woken
+    mid-step (by a message or a tile change) takes part in the rest of the step like the default engine.
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.asleep = {}        # {robot: (deadline, watched tiles)}
+        self.deadlines = []     # heap of (deadline, robot id, robot); stale entries are skipped
+        self.timestep = 0       # current timestep, given to the robots woken during it
+
+    def sleep(self, robot, deadline=None, tile=None):
+        """Put robot to sleep until deadline (a timestep), a message, or a change of the tile at position tile or of a tile it senses."""
+        watched = [self.grid.tiles[tile]] if tile is not None else []
+        x, y = robot.cell
+        for dx, dy in SENSE_VECT[robot.dir]: # what sense() would record next
+            other = self.grid.tiles.get((x + dx, y + dy))
+            if other is not None:
+                watched.append(other)
+        self.asleep[robot] = (deadline, watched)
+        if deadline is not None:
+            heapq.heappush(self.deadlines, (deadline, robot.id, robot))
+        for other in watched:
+            other.watchers.add(robot)
+
+    def wake(self, robot):
+        if robot in self.asleep:
+            deadline, watched = self.asleep.pop(robot)
+            for tile in watched:
+                tile.watchers.discard(robot)
+            robot.timestep = self.timestep
+
+    def is_awake(self, robot):
+        return robot not in self.asleep
+
+    def awake(self, robots):
+        """The robots (in order) that are not asleep when their turn comes."""
+        if not self.asleep:
+            return robots # nobody falls asleep during a step
+        return (robot for robot in robots if robot not in self.asleep)
+
+    def next_deadline(self):
+        """Earliest deadline a sleeping robot waits for, or None."""
+        while self.deadlines:
+            deadline, robot_id, robot = self.deadlines[0]
+            if robot in self.asleep and self.asleep[robot][0] == deadline:
+                return deadline
+            heapq.heappop(self.deadlines) # robot woke up earlier
+        return None
+
+    def advance(self, timestep):
+        """Start timestep: wake every robot whose deadline is at or before it."""
+        self.timestep = timestep
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > timestep:
+                return
+            deadline, robot_id, robot = heapq.heappop(self.deadlines)
+            self.wake(robot)
+
+    def put_to_sleep(self, robots):
+        """Put the robots that have nothing to do until an event to sleep."""
+        for robot in robots:
+            if robot in self.asleep:
+                continue
+            idle = robot.idle_until()
+            if idle:
+                self.sleep(robot, *idle)
+
+    def stalled(self):
+        """True when every robot sleeps with no deadline; only an outside change could wake them."""
+        return len(self.asleep) == len(self.grid.robots) and self.next_deadline() is None
@@ -1,18 +1,61 @@
 import pygame
 import random
 import sys
+import os
+import time
+import contextlib
 from collections import defaultdict
 
 from config import *
 from robot import *
 from base import *
+from store import *
+from metrics import *
+from scheduler import *
+from spans import *
+from matchmaker import *
+from trajectory import *
+from heatmap import *
+from viewer import *
+from render import *
 
 class Simulation:
-    def __init__(self):
-        self.grid = Grid()
+    def __init__(self, use_store: bool = False, use_scheduler: bool = False, use_spans: bool = False, use_matchmaker: bool = False, scenario=None, use_heatmaps: bool = False, sparse: bool = False):
+        self.grid = Grid(scenario=scenario, sparse=sparse) # scenario: gold and spawns from scenario.py instead of random placement; sparse: create tiles on first use
         self.timestep = 0
+        if use_store: # keep robot state in struct-of-arrays form
+            self.grid.store = RobotStore()
+        if use_scheduler: # skip robots that are only waiting for an event
+            self.grid.scheduler = Scheduler(self.grid)
+        if use_spans: # record handshake latencies and outcomes
+            self.grid.spans = SpanRecorder()
+        if use_matchmaker: # assign helpers centrally instead of broadcasting help requests
+            self.grid.matchmaker = Matchmaker(self.grid)
+        if use_heatmaps: # per-tile visit, wait, drop and restriction counters
+            self.grid.heatmaps = Heatmaps()
+        self.heatmap_layer = None # heatmap layer drawn over the grid, one of LAYERS
+        self.metrics = None # MetricsStream, see stream_metrics
+        self.trajectory = None # TrajectoryWriter, see record_trajectory
+        self.viewer = None # Viewer, see serve_viewer
+        self.recorder = None # FrameRecorder, see record_frames
+        self.log_messages = True # dump every robot's messages each step (turned off for quiet runs)
 
-        self.initialize_robots_horizontal() # change initialization (how the robots are aligned at the start)
+        if scenario:
+            self.initialize_robots_scenario(scenario)
+        else:
+            self.initialize_robots_horizontal() # change initialization (how the robots are aligned at the start)
+
+    def new_robot(self, **kwargs):
+        """Create a robot, backed by the grid's RobotStore if there is one."""
+        if self.grid.store:
+            return StoredRobot(self.grid.store, **kwargs)
+        return Robot(**kwargs)
+
+    def initialize_robots_scenario(self, scenario):
+        deposits = scenario.deposits()
+        for team, (x, y), direction in scenario.spawns:
+            robot = self.new_robot(grid=self.grid, team=team, position=[x,y], direction=direction, deposit=list(deposits[team]), timestep=self.timestep)
+            self.grid.add_robot(robot=robot, pos=(x,y))
 
     def initialize_robots_vertical(self):
         # Red team
@@ -22,8 +65,8 @@ class Simulation:
         blue_deposit_pos = [GRID_SIZE-1, GRID_SIZE-1]
         bx,by = [GRID_SIZE-1,GRID_SIZE-2]
         for i in range(ROBOTS_PER_TEAM):
-            r_robot = Robot(grid=self.grid, team=Team.RED, position=[rx,ry], direction = Dir.EAST, deposit = red_deposit_pos, timestep=self.timestep)
-            b_robot = Robot(grid=self.grid, team=Team.BLUE, position=[bx,by], direction=Dir.WEST, deposit = blue_deposit_pos, timestep=self.timestep)
+            r_robot = self.new_robot(grid=self.grid, team=Team.RED, position=[rx,ry], direction = Dir.EAST, deposit = red_deposit_pos, timestep=self.timestep)
+            b_robot = self.new_robot(grid=self.grid, team=Team.BLUE, position=[bx,by], direction=Dir.WEST, deposit = blue_deposit_pos, timestep=self.timestep)
 
             self.grid.add_robot(robot=r_robot, pos=(rx,ry))
             self.grid.add_robot(robot=b_robot, pos=(bx,by))
@@ -39,8 +82,8 @@ class Simulation:
         blue_deposit_pos = [GRID_SIZE-1, GRID_SIZE-1]
         bx,by = [GRID_SIZE-2,GRID_SIZE-1]
         for i in range(ROBOTS_PER_TEAM):
-            r_robot = Robot(grid=self.grid, team=Team.RED, position=[rx,ry], direction = Dir.SOUTH, deposit = red_deposit_pos, timestep=self.timestep)
-            b_robot = Robot(grid=self.grid, team=Team.BLUE, position=[bx,by], direction=Dir.NORTH, deposit = blue_deposit_pos, timestep=self.timestep)
+            r_robot = self.new_robot(grid=self.grid, team=Team.RED, position=[rx,ry], direction = Dir.SOUTH, deposit = red_deposit_pos, timestep=self.timestep)
+            b_robot = self.new_robot(grid=self.grid, team=Team.BLUE, position=[bx,by], direction=Dir.NORTH, deposit = blue_deposit_pos, timestep=self.timestep)
 
             self.grid.add_robot(robot=r_robot, pos=(rx,ry))
             self.grid.add_robot(robot=b_robot, pos=(bx,by))
@@ -50,13 +93,13 @@ class Simulation:
     
     def initialize_robots_test(self):
         red_deposit_pos = [0,0]
-        robot_1 = Robot(grid=self.grid, team=Team.RED, position=[1,0], direction = Dir.SOUTH, deposit = red_deposit_pos, timestep=self.timestep)
-        robot_2 = Robot(grid=self.grid, team=Team.RED, position=[1,1], direction = Dir.SOUTH, deposit = red_deposit_pos, timestep=self.timestep)
+        robot_1 = self.new_robot(grid=self.grid, team=Team.RED, position=[1,0], direction = Dir.SOUTH, deposit = red_deposit_pos, timestep=self.timestep)
+        robot_2 = self.new_robot(grid=self.grid, team=Team.RED, position=[1,1], direction = Dir.SOUTH, deposit = red_deposit_pos, timestep=self.timestep)
         self.grid.add_robot(robot=robot_1, pos=(1,0))
         self.grid.add_robot(robot=robot_2, pos=(1,1))
 
-        robot_3 = Robot(grid=self.grid, team=Team.RED, position=[1,2], direction = Dir.SOUTH, deposit = red_deposit_pos, timestep=self.timestep)
-        robot_4 = Robot(grid=self.grid, team=Team.RED, position=[1,3], direction = Dir.SOUTH, deposit = red_deposit_pos, timestep=self.timestep)
+        robot_3 = self.new_robot(grid=self.grid, team=Team.RED, position=[1,2], direction = Dir.SOUTH, deposit = red_deposit_pos, timestep=self.timestep)
+        robot_4 = self.new_robot(grid=self.grid, team=Team.RED, position=[1,3], direction = Dir.SOUTH, deposit = red_deposit_pos, timestep=self.timestep)
         self.grid.add_robot(robot=robot_3, pos=(1,2))
         self.grid.add_robot(robot=robot_4, pos=(1,3))
 
@@ -68,9 +111,14 @@ class Simulation:
         screen.blit(scores,(8,8))
 
         # Draw grid
+        if self.grid.sparse: # cell borders as lines, since most cells have no tile
+            for i in range(GRID_SIZE + 1):
+                pygame.draw.line(screen, BLACK, (i * CELL_SIZE, SCORES_HEIGHT), (i * CELL_SIZE, Y_WINDOW_SIZE), 1)
+                pygame.draw.line(screen, BLACK, (0, i * CELL_SIZE + SCORES_HEIGHT), (X_WINDOW_SIZE, i * CELL_SIZE + SCORES_HEIGHT), 1)
         for (gx, gy), tile in self.grid.tiles.items():
-            rect = pygame.Rect(gx * CELL_SIZE, gy * CELL_SIZE + SCORES_HEIGHT, CELL_SIZE, CELL_SIZE)
-            pygame.draw.rect(screen, BLACK, rect, 1)
+            if not self.grid.sparse:
+                rect = pygame.Rect(gx * CELL_SIZE, gy * CELL_SIZE + SCORES_HEIGHT, CELL_SIZE, CELL_SIZE)
+                pygame.draw.rect(screen, BLACK, rect, 1)
 
             # Draw deposit
             if tile.deposit:
@@ -86,7 +134,8 @@ class Simulation:
                 screen.blit(txt, txt.get_rect(center = (cx, cy)))
 
     def draw_robots(self, screen):
-        for (gx, gy), tile in self.grid.tiles.items():
+        for gx, gy in dict.fromkeys(robot.cell for robot in self.grid.robots): # occupied cells, once each
+            tile = self.grid.tiles[(gx, gy)]
             teams = {Team.RED: [], Team.BLUE: []}
             for r in tile.robots:
                 teams[r.team].append(r)
@@ -135,6 +184,8 @@ class Simulation:
         screen.fill(WHITE)
 
         self.draw_grid(screen)
+        if self.grid.heatmaps and self.heatmap_layer:
+            self.grid.heatmaps.draw(screen, self.heatmap_layer, self.timestep)
         self.draw_robots(screen)\
         
     def print_team_messages(self):
@@ -165,32 +216,112 @@ class Simulation:
                     print(ANSI.CYAN.value + f"  timestep: {message.timestep}, type: {message.mtype}, content: {message.content}, proposer: {message.proposer.id}, countdown: {message.countdown}" + ANSI.RESET.value)
         print("==============================")
 
+    def stream_metrics(self, sink, every: int = 1):
+        """Push a metrics record to sink every `every` timesteps (written on a background thread)."""
+        self.metrics = MetricsStream(sink, every=every)
+        return self.metrics
+
+    def serve_viewer(self, host: str = "localhost", port: int = 8000):
+        """Stream every step to browsers at http://host:port/ (see viewer.py)."""
+        self.viewer = Viewer(self, host=host, port=port)
+        return self.viewer
+
+    def record_trajectory(self, path: str, chunk_steps: int = 4096):
+        """Record every robot's state after each timestep into memory-mapped chunks under path (close() the writer when done)."""
+        self.trajectory = TrajectoryWriter(path, self.grid.robots, chunk_steps=chunk_steps)
+        return self.trajectory
+
+    def record_frames(self, path: str, every: int = 1, scale: float = 1.0, fps: int = 30):
+        """Render a frame every `every` timesteps to a PNG sequence or video at path, off the display (close() the recorder when done)."""
+        self.recorder = FrameRecorder(self, path, every=every, scale=scale, fps=fps)
+        return self.recorder
+
+    def active_robots(self):
+        """Robots taking part in a phase, in order: all of them, minus any the scheduler has asleep when their turn comes."""
+        if self.grid.scheduler:
+            return self.grid.scheduler.awake(self.grid.robots)
+        return self.grid.robots
+
     def step(self):
+        start = time.perf_counter()
+        self.begin_step()
+        self.execute_phase()
+        self.end_step(start)
+
+    def begin_step(self):
+        """Sensing, planning and reading phases."""
+        scheduler = self.grid.scheduler
+        if scheduler:
+            scheduler.advance(self.timestep) # wake robots whose deadline has come
+
         print("========= START OF TIMESTEP " + str(self.timestep) + " =========")
-        for robot in self.grid.robots:
+        for robot in self.active_robots():
             robot.timestep = self.timestep
 
-        for robot in self.grid.robots:
+        for robot in self.active_robots():
             robot.sense()
 
         print("PLANNING PHASE")
-        for robot in self.grid.robots:
+        for robot in self.active_robots():
             robot.plan(self.timestep)
+        if self.grid.matchmaker:
+            self.grid.matchmaker.match()
         print("END OF PLANNING PHASE")
 
         print("READING PHASE")
-        for robot in self.grid.robots:
+        for robot in self.active_robots():
             robot.read_message()
         
-        self.print_team_messages()
-        self.print_partner_messages()
+        if self.log_messages:
+            self.print_team_messages()
+            self.print_partner_messages()
         print("END OF READING PHASE")
-    
+
+    def execute_phase(self):
         print("EXECUTION PHASE")
-        for robot in self.grid.robots:
-            robot.execute(self.timestep)
+        if self.grid.store: # batched movement
+            self.grid.store.execute(self.grid.robots) # skips sleeping robots itself
+        else:
+            for robot in self.active_robots():
+                robot.execute(self.timestep)
         print("END OF EXECUTION PHASE")
 
+    def end_step(self, start):
+        """Drop checks, clock, metrics and scheduling once the robots have acted."""
+        scheduler = self.grid.scheduler
         print("========= END OF TIMESTEP " + str(self.timestep) + " =========")
         self.grid.check_gold()
-        self.timestep += 1
\ No newline at end of file
+        self.timestep += 1
+        message_pool.recycle() # the messages KBs dropped this step can be handed out again
+
+        if self.metrics:
+            self.metrics.record(self, time.perf_counter() - start)
+        if self.trajectory:
+            self.trajectory.record(self)
+        if self.viewer:
+            self.viewer.publish(self)
+        if self.recorder:
+            self.recorder.record(self)
+
+        if scheduler:
+            scheduler.put_to_sleep(self.active_robots())
+            if len(scheduler.asleep) == len(self.grid.robots): # everyone asleep: jump to the next deadline
+                deadline = scheduler.next_deadline()
+                if deadline is not None and deadline > self.timestep:
+                    self.timestep = deadline
+
+    def finished(self):
+        """The game ends once every piece of gold has been deposited."""
+        return self.grid.all_gold_collected()
+
+    def run(self, max_timesteps: int = None, quiet: bool = False):
+        """Step without a display until the game ends (or max_timesteps is reached); returns the timestep."""
+        self.log_messages = not quiet
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull if quiet else sys.stdout):
+            while not self.finished():
+                if max_timesteps is not None and self.timestep >= max_timesteps:
+                    break
+                if self.grid.scheduler and self.grid.scheduler.stalled():
+                    break # every robot sleeps with nothing scheduled to wake it
+                self.step()
+        return self.timestep
@@ -0,0 +1,92 @@
+import sys
+import random
+from collections import Counter
+
+from config import *
+
+"""
+Start/end timesteps and outcomes of the coordination handshakes:
+    pairup:    please_help / pairup_req -> pairup_ack -> partnered
+    pickup:    plan_pickup -> pickup_req / pickup_ack -> pickup_gold
+    move_sync: move_sync_req -> move_sync_ack -> sync plan activated
+Each robot taking part in a handshake records its own span. Outcomes are "ok", "expired" (the agreed
+timestep passed first) or "failed" (abandoned: partner lost, gold gone, out of sync, ...).
+
+    python spans.py 8 3000    # report over seeds 0..7, 3000 timesteps each
+"""
+
+KINDS = ["pairup", "pickup", "move_sync"]
+OUTCOMES = ["ok", "expired", "failed"]
+BINS = [1, 2, 4, 8, 16, 32, 64, 128] # latency histogram bin edges (timesteps); the last bin is open-ended
+
+class SpanRecorder:
+    def __init__(self):
+        self.open = {}  # {(kind, robot id): start timestep}
+        self.spans = [] # (kind, robot id, start, end, outcome)
+
+    def start(self, kind, robot, timestep):
+        """Open a span unless the robot already has one of this kind open."""
+        self.open.setdefault((kind, robot.id), timestep)
+
+    def end(self, kind, robot, timestep, outcome):
+        start = self.open.pop((kind, robot.id), None)
+        if start is not None:
+            self.spans.append((kind, robot.id, start, timestep, outcome))
+
+    def end_all(self, robot, timestep, outcome):
+        for kind in KINDS:
+            self.end(kind, robot, timestep, outcome)
+
+    def histogram(self, kind, outcome="ok"):
+        """Counts of span latencies per bin: [BINS[0], BINS[1]), ..., [BINS[-1], inf)."""
+        counts = [0] * len(BINS)
+        for k, robot_id, start, end, o in self.spans:
+            if k == kind and o == outcome:
+                latency = end - start
+                i = len(BINS) - 1
+                while i > 0 and latency < BINS[i]:
+                    i -= 1
+                counts[i] += 1
+        return counts
+
+    def summary(self):
+        """{kind: {"count", "ok", "expired", "failed", "failure_rate", "p50", "p90", "mean"}}, latencies of ok spans."""
+        summary = {}
+        for kind in KINDS:
+            outcomes = Counter(o for k, robot_id, start, end, o in self.spans if k == kind)
+            latencies = sorted(end - start for k, robot_id, start, end, o in self.spans if k == kind and o == "ok")
+            count = sum(outcomes.values())
+            summary[kind] = {
+                "count": count,
+                **{outcome: outcomes[outcome] for outcome in OUTCOMES},
+                "failure_rate": (count - outcomes["ok"]) / count if count else 0.0,
+                "p50": latencies[len(latencies) // 2] if latencies else None,
+                "p90": latencies[len(latencies) * 9 // 10] if latencies else None,
+                "mean": sum(latencies) / len(latencies) if latencies else None,
+            }
+        return summary
+
+    def report(self):
+        """Print the summary and a latency histogram per handshake."""
+        for kind, s in self.summary().items():
+            print(ANSI.CYAN.value + f"{kind}: {s['count']} spans, ok {s['ok']}, expired {s['expired']}, failed {s['failed']} (failure rate {s['failure_rate']:.0%})" + ANSI.RESET.value)
+            if s["mean"] is not None:
+                print(f"  latency of ok spans: mean {s['mean']:.1f}, p50 {s['p50']}, p90 {s['p90']}")
+            counts = self.histogram(kind)
+            top = max(counts) or 1
+            for i, n in enumerate(counts):
+                label = f"{BINS[i]}-{BINS[i + 1] - 1}" if i + 1 < len(BINS) else f"{BINS[i]}+"
+                print(f"  {label:>8} | {'#' * round(40 * n / top)} {n}")
+
+if __name__ == "__main__":
+    from simulation import Simulation
+
+    seeds = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    max_timesteps = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    recorder = SpanRecorder()
+    for seed in range(seeds):
+        random.seed(seed)
+        sim = Simulation(use_spans=True)
+        sim.grid.spans = recorder # one recorder across all seeds; robot ids are unique across games
+        sim.run(max_timesteps=max_timesteps, quiet=True)
+    recorder.report()
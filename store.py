@@ -0,0 +1,200 @@
+import numpy as np
+from config import *
+from robot import *
+
+# Int codes for robot decisions (index in the list == code); directions use Dir.value, see direction.py
+DECISIONS = ["wait", "move_forward", "turn_cw", "turn_ccw", "plan_pickup", "pickup_gold", "deposit_gold", "pair_up"]
+DECISION_CODE = {decision: code for code, decision in enumerate(DECISIONS)}
+TEAMS = [Team.RED, Team.BLUE]
+
+DIR_STEP = np.array(DIR_VECT_CODE, dtype=np.int32) # unit vector for each Dir.value
+TURN_STEP = np.zeros(len(DECISIONS), dtype=np.int8)              # change of Dir.value for each decision
+TURN_STEP[DECISION_CODE["turn_cw"]] = 1
+TURN_STEP[DECISION_CODE["turn_ccw"]] = -1
+WAIT = DECISION_CODE["wait"]
+MOVE_FORWARD = DECISION_CODE["move_forward"]
+BATCHED = np.zeros(len(DECISIONS), dtype=bool)                   # decisions that only touch the robot's own position/direction
+BATCHED[[DECISION_CODE[d] for d in ["wait", "move_forward", "turn_cw", "turn_ccw"]]] = True
+
+class RobotStore:
+    """Struct-of-arrays storage for the per-robot state that batch operations need."""
+
+    def __init__(self, capacity: int = 2 * ROBOTS_PER_TEAM):
+        self.size = 0       # number of slots in use
+        self.robots = []    # robot object for each slot
+        self.pos = np.zeros((capacity, 2), dtype=np.int32)      # [x,y]
+        self.dir = np.zeros(capacity, dtype=np.int8)            # Dir.value
+        self.decision = np.zeros(capacity, dtype=np.int8)       # DECISION_CODE
+        self.carrying = np.zeros(capacity, dtype=bool)
+        self.partner = np.full(capacity, -1, dtype=np.int32)    # slot of the partner, -1 if none
+        self.team = np.zeros(capacity, dtype=np.int8)           # Team.value
+        self.occupancy = np.zeros((GRID_SIZE, GRID_SIZE), dtype=np.int32) # number of robots on each tile, indexed [x,y]
+
+    def grow(self):
+        """Double the capacity of every array."""
+        capacity = max(1, 2 * len(self.dir))
+        for name in ["pos", "dir", "decision", "carrying", "partner", "team"]:
+            old = getattr(self, name)
+            new = np.full((capacity,) + old.shape[1:], -1 if name == "partner" else 0, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, robot, position):
+        """Reserve a slot for a robot standing at position and return it."""
+        if self.size == len(self.dir):
+            self.grow()
+        slot = self.size
+        self.size += 1
+        self.robots.append(robot)
+        self.pos[slot] = position
+        self.occupancy[position[0], position[1]] += 1
+        return slot
+
+    def positions(self):
+        """View of the positions of all robots, shape (size, 2)."""
+        return self.pos[:self.size]
+
+    def directions(self):
+        return self.dir[:self.size]
+
+    def decisions(self):
+        return self.decision[:self.size]
+
+    def execute(self, robots):
+        """Execution phase for robots (in grid order).
+
+        Consecutive robots that only wait, turn or move forward are handled together by move_batch;
+        any other decision (pickups, pairing, deposits) still runs through Robot.execute in between,
+        so the outcome is the same as executing the robots one at a time. Robots the Scheduler has
+        asleep are skipped; they never wait on a batched decision, so each one is checked again
+        once its turn comes.
+        """
+        scheduler = robots[0].grid.scheduler if robots else None
+        run = []
+        for robot in robots:
+            if BATCHED[self.decision[robot.slot]]:
+                if scheduler is None or scheduler.is_awake(robot):
+                    run.append(robot)
+            else:
+                self.move_batch(run)
+                run = []
+                if scheduler is None or scheduler.is_awake(robot):
+                    robot.execute(robot.timestep)
+        self.move_batch(run)
+
+    def move_batch(self, robots):
+        """Apply the wait/turn/move_forward decisions of a group of robots with array operations."""
+        if not robots:
+            return
+        for robot in robots:
+            robot.print_status()
+        slots = np.array([robot.slot for robot in robots])
+        codes = self.decision[slots]
+
+        # turns
+        self.dir[slots] = (self.dir[slots] + TURN_STEP[codes]) % 4
+
+        # moves, staying put at the edge of the grid
+        moving = codes == MOVE_FORWARD
+        movers = slots[moving]
+        if len(movers):
+            old = self.pos[movers].copy()
+            new = np.clip(old + DIR_STEP[self.dir[movers]], 0, GRID_SIZE - 1)
+            np.subtract.at(self.occupancy, (old[:, 0], old[:, 1]), 1)
+            np.add.at(self.occupancy, (new[:, 0], new[:, 1]), 1)
+            self.pos[movers] = new
+
+            # rebuild (in place, the KBs hold references) only the robot lists of tiles that changed;
+            # each mover leaves its tile and is appended to its new one, even when it stayed put
+            moved = [self.robots[slot] for slot in movers.tolist()]
+            departed = set(moved)
+            changed = {}
+            for robot, (x, y) in zip(moved, old.tolist()):
+                tile = robot.grid.tiles[(x, y)]
+                if tile not in changed:
+                    tile.robots[:] = [r for r in tile.robots if r not in departed]
+                    changed[tile] = True
+            for robot, (x, y), (ox, oy) in zip(moved, new.tolist(), old.tolist()):
+                tile = robot.grid.tiles[(x, y)]
+                tile.robots.append(robot)
+                changed[tile] = True
+                if robot.grid.heatmaps and (x, y) != (ox, oy):
+                    robot.grid.heatmaps.visit((x, y))
+            for tile in changed:
+                tile.changed()
+
+        # robots that turned or moved look around again
+        for robot, code in zip(robots, codes.tolist()):
+            if code != WAIT:
+                robot.sense()
+
+class StoredRobot(Robot):
+    """Robot whose position, direction, decision, carrying flag, partner and team live in a RobotStore."""
+
+    def __init__(self, store: RobotStore, *args, **kwargs):
+        self.store = store
+        self.slot = store.add(self, kwargs["position"])
+        super().__init__(*args, **kwargs)
+
+    @property
+    def pos(self):
+        return self.store.pos[self.slot].tolist() # same [x,y] list the plain Robot keeps
+
+    @pos.setter
+    def pos(self, value):
+        store = self.store
+        x, y = store.pos[self.slot]
+        store.occupancy[x, y] -= 1
+        store.pos[self.slot] = value
+        store.occupancy[value[0], value[1]] += 1
+
+    @property
+    def cell(self):
+        x, y = self.store.pos[self.slot].tolist()
+        return (x, y)
+
+    @cell.setter
+    def cell(self, value):
+        pass # follows store.pos, which move_batch updates directly
+
+    @property
+    def dir(self):
+        return DIR_ORDER[self.store.dir[self.slot]]
+
+    @dir.setter
+    def dir(self, value):
+        self.store.dir[self.slot] = value.value
+
+    @property
+    def decision(self):
+        return DECISIONS[self.store.decision[self.slot]]
+
+    @decision.setter
+    def decision(self, value):
+        self.store.decision[self.slot] = DECISION_CODE[value]
+
+    @property
+    def carrying(self):
+        return bool(self.store.carrying[self.slot])
+
+    @carrying.setter
+    def carrying(self, value):
+        self.store.carrying[self.slot] = value
+        self.grid.update_carrying(self)
+
+    @property
+    def partner(self):
+        slot = self.store.partner[self.slot]
+        return self.store.robots[slot] if slot >= 0 else None
+
+    @partner.setter
+    def partner(self, value):
+        self.store.partner[self.slot] = value.slot if value else -1
+
+    @property
+    def team(self):
+        return TEAMS[self.store.team[self.slot]]
+
+    @team.setter
+    def team(self, value):
+        self.store.team[self.slot] = value.value
@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import argparse
+import itertools
+import subprocess
+import multiprocessing
+
+"""
+Parameter sweeps over config values (GRID_SIZE, ROBOTS_PER_TEAM, GOLDS, PLAN_DELAY, PICKUP_DELAY, ...).
+
+A job is one (config, seed, timestep budget) triple; jobs are grouped into work units and handed out through a queue.
+Every job runs headless in its own interpreter with CPR_CONFIG set (see config.py), so workers can
+run any mix of configs. Results are stored by job key, so a job is never run twice, even when a
+worker dies and its unit is handed out again. A job whose interpreter fails is stored as a failed
+result (with an "error"), so its unit still completes; submitting it again queues it for a retry.
+
+    python sweep.py submit sweep.db --grid '{"GRID_SIZE": [20, 30], "PLAN_DELAY": [5, 10]}' --seeds 10 --max-timesteps 5000
+    python sweep.py work sweep.db --workers 4       # on every node that can reach sweep.db
+    python sweep.py results sweep.db
+"""
+
+MAX_TIMESTEPS = 5000 # default budget of a job; every job needs one, a game that never ends would hold its unit forever
+
+def job_key(config: dict, seed: int, max_timesteps: int = MAX_TIMESTEPS):
+    """Stable key of a (config, seed, max_timesteps) job."""
+    text = json.dumps({"config": config, "seed": seed, "max_timesteps": max_timesteps}, sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+def make_job(config: dict, seed: int, max_timesteps: int = MAX_TIMESTEPS):
+    """A job running config with seed until the game ends or max_timesteps."""
+    if not isinstance(max_timesteps, int) or max_timesteps <= 0:
+        raise ValueError(f"max_timesteps must be a positive int, got {max_timesteps!r}")
+    return {"key": job_key(config, seed, max_timesteps), "config": config, "seed": seed, "max_timesteps": max_timesteps}
+
+def make_jobs(grid: dict, seeds, max_timesteps: int = MAX_TIMESTEPS):
+    """One job per combination of the values in grid ({name: [values]}) and seed."""
+    names = sorted(grid)
+    jobs = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        config = dict(zip(names, values))
+        for seed in seeds:
+            jobs.append(make_job(config, seed, max_timesteps))
+    return jobs
+
+def run_job(job: dict):
+    """Run one job in a fresh interpreter and return its result dict (a failed result if the run fails)."""
+    env = dict(os.environ, CPR_CONFIG=json.dumps(job["config"]), SDL_VIDEODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    command = [sys.executable, os.path.abspath(__file__), "run", json.dumps(job)]
+    try:
+        output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+        return json.loads(output.strip().splitlines()[-1])
+    except subprocess.CalledProcessError as e:
+        lines = e.stderr.strip().splitlines()
+        return failed_result(job, lines[-1] if lines else f"exit status {e.returncode}")
+    except (OSError, IndexError, ValueError) as e: # could not start, or no/garbled result line
+        return failed_result(job, f"{type(e).__name__}: {e}")
+
+def failed_result(job: dict, error: str):
+    """Result of a job whose run failed; it scores no gold."""
+    return {
+        "key": job["key"],
+        "config": job["config"],
+        "seed": job["seed"],
+        "max_timesteps": job["max_timesteps"],
+        "timesteps": 0,
+        "finished": False,
+        "score_red": 0,
+        "score_blue": 0,
+        "gold_per_timestep": 0.0,
+        "error": error,
+    }
+
+def simulate(job: dict):
+    """Run a job in this interpreter (config must already match job["config"])."""
+    from config import Team
+    from simulation import Simulation
+
+    random.seed(job["seed"])
+    start = time.perf_counter()
+    sim = Simulation()
+    timesteps = sim.run(max_timesteps=job["max_timesteps"], quiet=True)
+    red, blue = sim.grid.scores[Team.RED], sim.grid.scores[Team.BLUE]
+    return {
+        "key": job["key"],
+        "config": job["config"],
+        "seed": job["seed"],
+        "max_timesteps": job["max_timesteps"],
+        "timesteps": timesteps,
+        "finished": sim.finished(),
+        "score_red": red,
+        "score_blue": blue,
+        "gold_per_timestep": (red + blue) / timesteps if timesteps else 0.0,
+        "wall_time": time.perf_counter() - start,
+    }
+
+class SQLiteQueue:
+    """Work queue and result store in one SQLite file.
+
+    Any queue with the same methods (put, get, complete, has_result, results) can be used instead,
+    e.g. one backed by a message broker. A unit handed out with get() is leased for lease seconds;
+    if it is not completed by then (worker died), it is handed out again.
+    """
+
+    def __init__(self, path: str, lease: float = 3600):
+        self.lease = lease
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS units (id INTEGER PRIMARY KEY, jobs TEXT, status TEXT, worker TEXT, lease_until REAL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT, failed INTEGER DEFAULT 0)")
+
+    def put(self, jobs: list):
+        """Add a work unit (a list of jobs)."""
+        self.db.execute("INSERT INTO units (jobs, status) VALUES (?, 'pending')", (json.dumps(jobs),))
+
+    def get(self, worker: str):
+        """Lease the next work unit; returns (unit id, jobs) or None when nothing is left to do."""
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        row = self.db.execute("SELECT id, jobs FROM units WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?) ORDER BY id LIMIT 1", (now,)).fetchone()
+        if row:
+            self.db.execute("UPDATE units SET status = 'leased', worker = ?, lease_until = ? WHERE id = ?", (worker, now + self.lease, row[0]))
+        self.db.execute("COMMIT")
+        return (row[0], json.loads(row[1])) if row else None
+
+    def complete(self, unit_id: int, results: list):
+        """Store the results of a unit (first successful result per job key wins) and mark the unit done."""
+        self.db.execute("BEGIN IMMEDIATE")
+        for result in results:
+            self.db.execute("INSERT INTO results (key, result, failed) VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE SET result = excluded.result, failed = excluded.failed WHERE failed",
+                            (result["key"], json.dumps(result), "error" in result))
+        self.db.execute("UPDATE units SET status = 'done' WHERE id = ?", (unit_id,))
+        self.db.execute("COMMIT")
+
+    def has_result(self, key: str):
+        """Whether the job has a successful result (failed ones are run again when resubmitted)."""
+        return self.db.execute("SELECT 1 FROM results WHERE key = ? AND NOT failed", (key,)).fetchone() is not None
+
+    def results(self):
+        return [json.loads(row[0]) for row in self.db.execute("SELECT result FROM results ORDER BY key")]
+
+def submit(queue, jobs: list, unit_size: int = 1):
+    """Queue the jobs that have no result yet, unit_size jobs per work unit; returns how many were queued."""
+    jobs = [job for job in jobs if not queue.has_result(job["key"])]
+    for i in range(0, len(jobs), unit_size):
+        queue.put(jobs[i:i + unit_size])
+    return len(jobs)
+
+def work(queue, worker: str):
+    """Run work units until the queue is empty."""
+    while True:
+        unit = queue.get(worker)
+        if unit is None:
+            return
+        unit_id, jobs = unit
+        results = []
+        for job in jobs:
+            if not queue.has_result(job["key"]): # done by an earlier (restarted) worker
+                results.append(run_job(job)) # never raises, so the unit is always completed
+        queue.complete(unit_id, results)
+
+def work_process(path: str, worker: str):
+    work(SQLiteQueue(path), worker)
+
+def parse_seeds(text: str):
+    """"10" -> seeds 0..9, "5-9" -> seeds 5..9"""
+    if "-" in text:
+        first, last = text.split("-")
+        return list(range(int(first), int(last) + 1))
+    return list(range(int(text)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweeps over headless simulation runs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    submit_parser = commands.add_parser("submit")
+    submit_parser.add_argument("db")
+    submit_parser.add_argument("--grid", required=True, help='JSON {name: [values]}, e.g. {"GRID_SIZE": [20, 30]}')
+    submit_parser.add_argument("--seeds", default="1")
+    submit_parser.add_argument("--unit-size", type=int, default=1)
+    submit_parser.add_argument("--max-timesteps", type=int, default=MAX_TIMESTEPS)
+    work_parser = commands.add_parser("work")
+    work_parser.add_argument("db")
+    work_parser.add_argument("--workers", type=int, default=1)
+    results_parser = commands.add_parser("results")
+    results_parser.add_argument("db")
+    run_parser = commands.add_parser("run") # used by run_job
+    run_parser.add_argument("job")
+    args = parser.parse_args()
+
+    if args.command == "submit":
+        queued = submit(SQLiteQueue(args.db), make_jobs(json.loads(args.grid), parse_seeds(args.seeds), args.max_timesteps), args.unit_size)
+        print(f"queued {queued} jobs")
+    elif args.command == "work":
+        name = f"{os.uname().nodename}:{os.getpid()}"
+        processes = [multiprocessing.Process(target=work_process, args=(args.db, f"{name}:{i}")) for i in range(args.workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    elif args.command == "results":
+        for result in SQLiteQueue(args.db).results():
+            print(json.dumps(result))
+    elif args.command == "run":
+        print(json.dumps(simulate(json.loads(args.job))))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import os
+import json
+import numpy as np
+
+from config import *
+from store import DECISIONS, DECISION_CODE
+
+"""
+Trajectory files: every robot's position, direction, decision and carrying flag at every timestep.
+
+A trajectory is a directory of chunks. Each chunk holds chunk_steps rows, one column per field
+(chunk_00000_pos.npy, ...), written through memory maps. meta.json indexes the chunks by their
+first/last timestep and the columns by robot id. Reading a time window or one robot only maps
+the chunks it needs.
+
+    writer = sim.record_trajectory("runs/seed0")
+    sim.run(quiet=True); writer.close()
+    Trajectory("runs/seed0").robot(3, start=100, end=200)["pos"]    # (rows, 2)
+"""
+
+# {column: (dtype, shape of one robot's value)}
+COLUMNS = {
+    "pos": (np.int16, (2,)),    # [x,y]
+    "dir": (np.int8, ()),       # Dir.value
+    "decision": (np.int8, ()),  # DECISION_CODE
+    "carrying": (np.bool_, ()),
+}
+
+class TrajectoryWriter:
+    """Appends one row per timestep for a fixed set of robots (see Simulation.record_trajectory)."""
+
+    def __init__(self, path: str, robots: list, chunk_steps: int = 4096):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.robots = list(robots)
+        self.chunk_steps = chunk_steps
+        self.meta = {
+            "robot_ids": [robot.id for robot in self.robots],
+            "chunk_steps": chunk_steps,
+            "decisions": DECISIONS,
+            "chunks": [], # [{"name", "rows", "first", "last"}]
+        }
+        self.chunk = None # {column: memmap} of the chunk being written
+        self.row = 0
+        self.slots = None
+        store = self.robots[0].grid.store if self.robots else None
+        if store:
+            self.slots = np.array([robot.slot for robot in self.robots])
+
+    def new_chunk(self):
+        if self.chunk:
+            self.flush()
+        name = f"chunk_{len(self.meta['chunks']):05d}"
+        n = len(self.robots)
+        self.chunk = {"timestep": np.lib.format.open_memmap(os.path.join(self.path, f"{name}_timestep.npy"), mode="w+", dtype=np.int64, shape=(self.chunk_steps,))}
+        for column, (dtype, shape) in COLUMNS.items():
+            self.chunk[column] = np.lib.format.open_memmap(os.path.join(self.path, f"{name}_{column}.npy"), mode="w+", dtype=dtype, shape=(self.chunk_steps, n) + shape)
+        self.meta["chunks"].append({"name": name, "rows": 0, "first": None, "last": None})
+        self.row = 0
+
+    def record(self, sim):
+        """Append the state after the timestep sim just finished."""
+        if self.chunk is None or self.row == self.chunk_steps:
+            self.new_chunk()
+        chunk, row = self.chunk, self.row
+        timestep = sim.timestep - 1
+        chunk["timestep"][row] = timestep
+        if self.slots is not None: # copy straight out of the RobotStore
+            store = sim.grid.store
+            chunk["pos"][row] = store.pos[self.slots]
+            chunk["dir"][row] = store.dir[self.slots]
+            chunk["decision"][row] = store.decision[self.slots]
+            chunk["carrying"][row] = store.carrying[self.slots]
+        else:
+            pos, dirs, decisions, carrying = chunk["pos"][row], chunk["dir"][row], chunk["decision"][row], chunk["carrying"][row]
+            for i, robot in enumerate(self.robots):
+                pos[i] = robot.pos
+                dirs[i] = robot.dir.value
+                decisions[i] = DECISION_CODE[robot.decision]
+                carrying[i] = robot.carrying
+        entry = self.meta["chunks"][-1]
+        entry["rows"] = row + 1
+        if entry["first"] is None:
+            entry["first"] = timestep
+        entry["last"] = timestep
+        self.row += 1
+
+    def flush(self):
+        """Write the mapped chunk and the index to disk."""
+        for array in self.chunk.values():
+            array.flush()
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(self.meta, f)
+
+    def close(self):
+        if self.chunk:
+            self.flush()
+            self.chunk = None
+
+class Trajectory:
+    """Read side of a trajectory directory; chunks are memory-mapped on first use."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.chunks = [chunk for chunk in self.meta["chunks"] if chunk["rows"]]
+        self.column_of = {robot_id: i for i, robot_id in enumerate(self.meta["robot_ids"])}
+        self.mapped = {} # {chunk name: {column: memmap}}
+
+    def columns(self, chunk):
+        name = chunk["name"]
+        if name not in self.mapped:
+            self.mapped[name] = {column: np.load(os.path.join(self.path, f"{name}_{column}.npy"), mmap_mode="r")[:chunk["rows"]] for column in ["timestep", *COLUMNS]}
+        return self.mapped[name]
+
+    def window(self, start: int = None, end: int = None, robot_id: int = None):
+        """{column: array} of the rows with start <= timestep < end, for every robot or just robot_id."""
+        parts = {column: [] for column in ["timestep", *COLUMNS]}
+        robot = self.column_of[robot_id] if robot_id is not None else slice(None)
+        for chunk in self.chunks:
+            if (end is not None and chunk["first"] >= end) or (start is not None and chunk["last"] < start):
+                continue
+            columns = self.columns(chunk)
+            timesteps = columns["timestep"]
+            lo = np.searchsorted(timesteps, start) if start is not None else 0
+            hi = np.searchsorted(timesteps, end) if end is not None else len(timesteps)
+            parts["timestep"].append(timesteps[lo:hi])
+            for column in COLUMNS:
+                parts[column].append(columns[column][lo:hi, robot])
+        return {column: np.concatenate(arrays) if arrays else np.zeros(0) for column, arrays in parts.items()}
+
+    def robot(self, robot_id: int, start: int = None, end: int = None):
+        """{column: array} of one robot's rows with start <= timestep < end."""
+        return self.window(start, end, robot_id)
+
+    def timesteps(self):
+        """Every recorded timestep (the scheduler may skip some)."""
+        return np.concatenate([self.columns(chunk)["timestep"] for chunk in self.chunks]) if self.chunks else np.zeros(0, dtype=np.int64)
@@ -0,0 +1,82 @@
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from config import ANSI
+from sweep import make_job, run_job
+
+"""
+Successive-halving search over the protocol timing constants, maximising deposited gold per timestep.
+Only constants the robots choose are searched; MESSAGE_DELAY describes the network they run on, so it
+stays at its configured value.
+
+Every rung runs the surviving configs over the same seeds for a timestep budget, keeps the best
+1/eta of them and multiplies the budget by eta, so most configs are dropped after short runs and
+only the best few are run for long.
+
+    python tune.py --configs 27 --eta 3 --min-timesteps 200 --max-timesteps 5400 --seeds 3 --workers 4
+"""
+
+# {config name: function(rng) -> value}
+SPACE = {
+    "PICKUP_DELAY": lambda rng: rng.randint(2, 20),
+    "PLAN_DELAY": lambda rng: rng.randint(2, 20),
+    "HELP_RADIUS": lambda rng: rng.randint(0, 10),
+    "ADAPTIVE_SYNC": lambda rng: rng.random() < 0.5, # when on, PICKUP_DELAY and PLAN_DELAY only apply before a partner's round trip is known
+    "SYNC_MARGIN": lambda rng: rng.randint(0, 5),     # these two only matter when ADAPTIVE_SYNC is on
+    "SYNC_DEVIATIONS": lambda rng: rng.randint(0, 6),
+}
+
+def sample_configs(n: int, rng: random.Random):
+    """n distinct random configs from SPACE."""
+    configs = []
+    while len(configs) < n:
+        config = {name: sample(rng) for name, sample in SPACE.items()}
+        if config not in configs:
+            configs.append(config)
+    return configs
+
+def evaluate(configs: list, seeds: list, max_timesteps: int, workers: int):
+    """Mean gold per timestep of every config over the seeds, each run for max_timesteps."""
+    jobs = [make_job(config, seed, max_timesteps) for config in configs for seed in seeds]
+    with ThreadPoolExecutor(workers) as pool: # every job is its own process (run_job)
+        results = list(pool.map(run_job, jobs))
+    scores = []
+    for i in range(len(configs)):
+        runs = results[i * len(seeds):(i + 1) * len(seeds)]
+        scores.append(sum(run["gold_per_timestep"] for run in runs) / len(runs))
+    return scores
+
+def successive_halving(configs: list, seeds: list, min_timesteps: int, max_timesteps: int, eta: int = 3, workers: int = 1):
+    """Return [(score, config)] of the configs that survived the last rung, best first."""
+    budget = min_timesteps
+    while True:
+        scores = evaluate(configs, seeds, budget, workers)
+        ranked = sorted(zip(scores, configs), key=lambda pair: -pair[0])
+        print(f"{ANSI.CYAN.value}rung: {len(configs)} configs x {len(seeds)} seeds, {budget} timesteps{ANSI.RESET.value}")
+        for score, config in ranked:
+            print(f"  {score:.4f} gold/timestep  {config}")
+        keep = max(1, len(configs) // eta)
+        if keep == len(configs) or budget * eta > max_timesteps:
+            return ranked
+        configs = [config for score, config in ranked[:keep]]
+        budget *= eta
+
+def main():
+    parser = argparse.ArgumentParser(description="Successive-halving tuner for the protocol timing constants")
+    parser.add_argument("--configs", type=int, default=27)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--min-timesteps", type=int, default=200)
+    parser.add_argument("--max-timesteps", type=int, default=5400)
+    parser.add_argument("--seeds", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the config sampler")
+    args = parser.parse_args()
+
+    configs = sample_configs(args.configs, random.Random(args.seed))
+    ranked = successive_halving(configs, list(range(args.seeds)), args.min_timesteps, args.max_timesteps, args.eta, args.workers)
+    score, config = ranked[0]
+    print(f"{ANSI.GREEN.value}best: {config} ({score:.4f} gold/timestep){ANSI.RESET.value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import sys
+import time
+import queue
+import struct
+import threading
+import numpy as np
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from config import *
+
+"""
+Browser viewer for headless hosts: serves a page at http://host:port/ and streams the simulation
+to it as binary frames over a long-lived HTTP response (/stream).
+
+Every frame is a little-endian uint32 length followed by:
+    header:   type (uint8: 0 keyframe, 1 delta), timestep (uint32), red and blue score x2 (uint16 each)
+    keyframe: grid size, robot count, red deposit x/y, blue deposit x/y (uint16 each),
+              then per robot x, y (uint16), dir, flags (uint8),
+              then gold tile count (uint32) and per tile x, y, gold (uint16)
+    delta:    changed robot count (uint16), per robot index, x, y (uint16), dir, flags (uint8),
+              then changed gold tile count (uint32) and per tile x, y, gold (uint16)
+Robot flags: 1 blue team, 2 carrying, 4 partnered. Robots are numbered by their index in grid.robots.
+
+publish() runs in the simulation loop and only diffs and encodes; sending happens on the server's
+threads. A client that falls MAX_QUEUED frames behind has its backlog dropped and gets a keyframe.
+
+    python viewer.py 8000 10    # headless game at 10 steps/s on http://localhost:8000/
+"""
+
+KEYFRAME, DELTA = 0, 1
+MAX_QUEUED = 32 # frames buffered per client before it is skipped ahead
+
+def robot_flags(robot):
+    return (robot.team == Team.BLUE) | (robot.carrying << 1) | ((robot.partner is not None) << 2)
+
+class Client:
+    def __init__(self):
+        self.frames = queue.Queue(maxsize=MAX_QUEUED)
+        self.stale = False # dropped frames; gets a keyframe next
+
+class Viewer:
+    """Streams a Simulation to browser clients (see Simulation.serve_viewer)."""
+
+    def __init__(self, sim, host: str = "localhost", port: int = 8000):
+        self.lock = threading.Lock()
+        self.clients = set()
+        self.robots = {}    # {index: (x, y, dir, flags)} as last sent
+        self.gold = np.zeros((GRID_SIZE, GRID_SIZE), dtype=np.int32)
+        self.header = None
+        self.deposits = [pos for pos, tile in sim.grid.tiles.items() if tile.deposit] # red's, then blue's
+        if sim.grid.gold_map is None:
+            sim.grid.attach_gold_map(np.zeros((GRID_SIZE, GRID_SIZE), dtype=np.int32))
+        self.capture(sim)
+
+        Handler = type("Handler", (ViewerHandler,), {"viewer": self})
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def capture(self, sim):
+        """Update the mirrored state (under self.lock once clients can join); returns the changed robots and gold tiles."""
+        grid = sim.grid
+        self.header = struct.pack("<IHH", sim.timestep, int(grid.scores[Team.RED] * 2), int(grid.scores[Team.BLUE] * 2))
+        robots = []
+        for i, robot in enumerate(grid.robots):
+            state = (robot.pos[0], robot.pos[1], robot.dir.value, robot_flags(robot))
+            if self.robots.get(i) != state:
+                self.robots[i] = state
+                robots.append((i,) + state)
+        xs, ys = np.nonzero(grid.gold_map != self.gold)
+        gold = np.stack([xs, ys, grid.gold_map[xs, ys]], axis=1)
+        self.gold[xs, ys] = grid.gold_map[xs, ys]
+        return robots, gold
+
+    def keyframe(self):
+        xs, ys = np.nonzero(self.gold)
+        gold = np.stack([xs, ys, self.gold[xs, ys]], axis=1)
+        parts = [struct.pack("<B", KEYFRAME), self.header, struct.pack("<HH", GRID_SIZE, len(self.robots))]
+        for x, y in self.deposits[:2]:
+            parts.append(struct.pack("<HH", x, y))
+        parts += [struct.pack("<HHBB", *self.robots[i]) for i in range(len(self.robots))]
+        parts += [struct.pack("<I", len(gold)), gold.astype("<u2").tobytes()]
+        return frame(b"".join(parts))
+
+    def publish(self, sim):
+        """Send what changed since the last step to every client."""
+        with self.lock: # join() builds keyframes from the mirrored state on the server's threads
+            robots, gold = self.capture(sim)
+            if not self.clients:
+                return
+            parts = [struct.pack("<B", DELTA), self.header, struct.pack("<H", len(robots))]
+            parts += [struct.pack("<HHHBB", *robot) for robot in robots]
+            parts += [struct.pack("<I", len(gold)), gold.astype("<u2").tobytes()]
+            delta = frame(b"".join(parts))
+            keyframe = None
+            for client in self.clients:
+                if client.stale:
+                    if client.frames.empty(): # caught up: start over from a keyframe
+                        keyframe = keyframe or self.keyframe()
+                        client.frames.put_nowait(keyframe)
+                        client.stale = False
+                    continue
+                try:
+                    client.frames.put_nowait(delta)
+                except queue.Full:
+                    client.stale = True
+                    drain(client.frames)
+
+    def join(self):
+        client = Client()
+        with self.lock:
+            client.frames.put_nowait(self.keyframe())
+            self.clients.add(client)
+        return client
+
+    def leave(self, client):
+        with self.lock:
+            self.clients.discard(client)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def frame(payload):
+    return struct.pack("<I", len(payload)) + payload
+
+def drain(frames):
+    while True:
+        try:
+            frames.get_nowait()
+        except queue.Empty:
+            return
+
+class ViewerHandler(BaseHTTPRequestHandler):
+    viewer = None
+
+    def do_GET(self):
+        if self.path == "/":
+            page = PAGE.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+        elif self.path == "/stream":
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            client = self.viewer.join()
+            try:
+                while True:
+                    self.wfile.write(client.frames.get())
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                self.viewer.leave(client)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass # keep the simulation's output readable
+
+PAGE = """<!DOCTYPE html>
+<html><head><title>Gold collection</title></head>
+<body style="font-family: sans-serif">
+<div id="scores">connecting...</div>
+<canvas id="grid" width="800" height="800"></canvas>
+<script>
+const canvas = document.getElementById("grid"), ctx = canvas.getContext("2d");
+let size = 0, robots = [], gold = new Map(), deposits = [];
+
+function header(view) {
+  const timestep = view.getUint32(1, true), red = view.getUint16(5, true) / 2, blue = view.getUint16(7, true) / 2;
+  document.getElementById("scores").textContent = `timestep ${timestep}   Red: ${red}   Blue: ${blue}`;
+  return 9;
+}
+function readGold(view, o) {
+  const n = view.getUint32(o, true); o += 4;
+  for (let i = 0; i < n; i++, o += 6) {
+    const key = view.getUint16(o, true) + "," + view.getUint16(o + 2, true), g = view.getUint16(o + 4, true);
+    if (g) gold.set(key, g); else gold.delete(key);
+  }
+}
+function apply(view) {
+  let o = header(view);
+  if (view.getUint8(0) === 0) {
+    size = view.getUint16(o, true); const n = view.getUint16(o + 2, true); o += 4;
+    deposits = [[view.getUint16(o, true), view.getUint16(o + 2, true)], [view.getUint16(o + 4, true), view.getUint16(o + 6, true)]]; o += 8;
+    robots = [];
+    for (let i = 0; i < n; i++, o += 6) robots.push([view.getUint16(o, true), view.getUint16(o + 2, true), view.getUint8(o + 4), view.getUint8(o + 5)]);
+    gold = new Map();
+  } else {
+    const n = view.getUint16(o, true); o += 2;
+    for (let i = 0; i < n; i++, o += 8) robots[view.getUint16(o, true)] = [view.getUint16(o + 2, true), view.getUint16(o + 4, true), view.getUint8(o + 6), view.getUint8(o + 7)];
+  }
+  readGold(view, o);
+}
+function draw() {
+  const c = canvas.width / (size || 1);
+  ctx.fillStyle = "white"; ctx.fillRect(0, 0, canvas.width, canvas.height);
+  ctx.fillStyle = "rgb(100,200,100)";
+  for (const [x, y] of deposits) ctx.fillRect(x * c, y * c, c, c);
+  ctx.fillStyle = "rgb(255,215,0)";
+  for (const key of gold.keys()) { const [x, y] = key.split(",").map(Number); ctx.beginPath(); ctx.arc((x + .5) * c, (y + .5) * c, c / 6, 0, 7); ctx.fill(); }
+  const slots = new Map();
+  for (const [x, y, dir, flags] of robots) {
+    const key = x + "," + y, k = slots.get(key) || 0; slots.set(key, k + 1);
+    const blue = flags & 1, carrying = flags & 2;
+    ctx.fillStyle = blue ? (carrying ? "rgb(0,0,139)" : "rgb(60,120,200)") : (carrying ? "rgb(139,0,0)" : "rgb(200,60,60)");
+    ctx.beginPath(); ctx.arc((x + (blue ? .75 : .25)) * c, (y + (k % 2 ? .75 : .25)) * c, c / 5, 0, 7); ctx.fill();
+  }
+  requestAnimationFrame(draw);
+}
+async function stream() {
+  const reader = (await fetch("/stream")).body.getReader();
+  let buffer = new Uint8Array(0);
+  while (true) {
+    const {value, done} = await reader.read();
+    if (done) break;
+    const joined = new Uint8Array(buffer.length + value.length); joined.set(buffer); joined.set(value, buffer.length); buffer = joined;
+    while (buffer.length >= 4) {
+      const length = new DataView(buffer.buffer, buffer.byteOffset).getUint32(0, true);
+      if (buffer.length < 4 + length) break;
+      apply(new DataView(buffer.buffer, buffer.byteOffset + 4, length));
+      buffer = buffer.slice(4 + length);
+    }
+  }
+  document.getElementById("scores").textContent += "   (stream ended)";
+}
+requestAnimationFrame(draw);
+stream();
+</script>
+</body></html>
+"""
+
+if __name__ == "__main__":
+    from simulation import Simulation
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else FPS
+    sim = Simulation()
+    sim.log_messages = False
+    sim.serve_viewer(port=port)
+    print(ANSI.GREEN.value + f"Viewer on http://localhost:{port}/" + ANSI.RESET.value)
+    while not sim.finished():
+        sim.run(max_timesteps=sim.timestep + 1, quiet=True)
+        time.sleep(1 / rate)
+    print(ANSI.GREEN.value + f"Game finished at timestep {sim.timestep}" + ANSI.RESET.value)
+    time.sleep(1)